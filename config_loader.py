@@ -1,18 +1,54 @@
-
 """Utility module for loading application configuration files."""
 from __future__ import annotations
 
 import json
+import os
 from pathlib import Path
 
+try:
+    import orjson
+except ModuleNotFoundError:  # orjson — необязательное ускорение
+    orjson = None  # type: ignore
+
+
+def _read_json(path: Path) -> dict:
+    """Read JSON from ``path`` using ``orjson`` when it is available."""
+    data = path.read_bytes()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8"))
+
+
+def dump_json(data: dict) -> bytes:
+    """Serialize ``data`` to UTF-8 JSON with a two-space indent."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def save_json(path: str | Path, data: dict) -> None:
+    """Atomically write ``data`` to ``path`` as JSON (see :func:`dump_json`).
+
+    The content goes to a side file first and is moved into place with
+    :func:`os.replace`, so a crash never leaves a truncated config behind.
+    If the write or the move fails, the side file is removed.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp_path.write_bytes(dump_json(data))
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
 
 def load_settings(path: str | Path = "settings.json") -> dict:
     """Load label generation settings from JSON file."""
     path = Path(path)
     if not path.exists():
         raise FileNotFoundError(f"Settings file not found: {path}")
-    with path.open("r", encoding="utf-8") as fh:
-        return json.load(fh)
+    return _read_json(path)
 
 
 def load_db_config(path: str | Path = "db_config.json") -> dict:
@@ -20,5 +56,4 @@ def load_db_config(path: str | Path = "db_config.json") -> dict:
     path = Path(path)
     if not path.exists():
         raise FileNotFoundError(f"DB config file not found: {path}")
-    with path.open("r", encoding="utf-8") as fh:
-        return json.load(fh)
+    return _read_json(path)
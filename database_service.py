@@ -4,18 +4,70 @@ DatabaseService module responsible for communication with MySQL.
 
 from __future__ import annotations
 
-from typing import Iterable, Dict, Optional
+from typing import TYPE_CHECKING, Iterable, Iterator, Dict, List, Optional
 from contextlib import contextmanager
+from functools import cache, lru_cache
+import importlib.util
+import json
+import threading
 import time
 import logging
 
 logger = logging.getLogger(__name__)
 
-try:
+if TYPE_CHECKING:
     import mysql.connector
-except ModuleNotFoundError as exc:
-    mysql = None  # type: ignore
-    _IMPORT_ERROR = exc
+    import mysql.connector.pooling
+
+# Количество строк, извлекаемых из курсора за один вызов ``fetchmany``.
+FETCH_BATCH_SIZE = 1000
+
+# Максимальное число SKU в одном подготовленном запросе.
+SKU_BATCH_SIZE = 500
+
+# Размер пула соединений общих сервисов, если он не задан в конфигурации.
+# Одновременно к БД обращаются построение превью, прогрев кэша и генерация
+# PDF; коннектор открывает все соединения пула сразу при его создании.
+DEFAULT_POOL_SIZE = 3
+
+# Общие сервисы по сериализованной конфигурации; см. :func:`get_shared_service`.
+_shared_services: Dict[str, "DatabaseService"] = {}
+_shared_services_lock = threading.Lock()
+
+
+def _batched(items: List, size: int) -> Iterator[List]:
+    """Разбивает список на последовательные части длиной не более ``size``."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@lru_cache(maxsize=32)
+def _products_query(count: int) -> str:
+    """Возвращает текст запроса вариаций для ``count`` SKU.
+
+    Текст кэшируется по количеству параметров, чтобы не собирать строку
+    заново и переиспользовать подготовленное выражение на сервере.
+    """
+    placeholders = ",".join(["%s"] * count)
+    return f"""
+        SELECT p.ID, p.post_title, p.post_parent, pm.meta_key, pm.meta_value
+        FROM wp_posts p
+        JOIN wp_postmeta pm ON p.ID = pm.post_id
+        WHERE (pm.meta_key IN ('_sku', '_price', '_regular_price', '_sale_price',
+                              '_product_attributes', '_variation_description', '_stock')
+               OR pm.meta_key LIKE 'attribute_%')
+          AND p.post_type = 'product_variation'
+          AND pm.post_id IN (
+            SELECT post_id FROM wp_postmeta WHERE meta_key = '_sku' AND meta_value IN ({placeholders})
+          )
+    """
+
+
+@lru_cache(maxsize=32)
+def _parents_query(count: int) -> str:
+    """Возвращает текст запроса родительских записей для ``count`` ID."""
+    placeholders = ",".join(["%s"] * count)
+    return f"SELECT ID, post_title, post_content FROM wp_posts WHERE ID IN ({placeholders})"
 
 
 class DatabaseConnectionError(Exception):
@@ -24,6 +76,36 @@ class DatabaseConnectionError(Exception):
     pass
 
 
+def mysql_available() -> bool:
+    """Проверяет, установлен ли ``mysql-connector-python``, не импортируя его."""
+    try:
+        return importlib.util.find_spec("mysql.connector") is not None
+    except ModuleNotFoundError:
+        return False
+
+
+@cache
+def _mysql():
+    """Возвращает модуль ``mysql.connector``, импортируя его при первом вызове.
+
+    Драйвер загружается только при первом обращении к БД, а не при запуске
+    приложения.
+
+    Raises
+    ------
+    DatabaseConnectionError
+        Если библиотека ``mysql-connector-python`` не установлена.
+    """
+    try:
+        import mysql.connector
+        import mysql.connector.pooling
+    except ModuleNotFoundError as exc:
+        raise DatabaseConnectionError(
+            "Библиотека 'mysql-connector-python' не установлена"
+        ) from exc
+    return mysql.connector
+
+
 class DatabaseService:
     """Сервис доступа к базе данных.
 
@@ -41,6 +123,11 @@ class DatabaseService:
 
         ``pool_size``
             Размер пула соединений. При значении больше нуля используется пул.
+            Пул создаётся при первом запросе соединения.
+
+        ``pool_reset_session``
+            Сбрасывать ли состояние сессии при возврате соединения в пул
+            (по умолчанию ``True``).
 
         ``max_retries``
             Количество попыток подключения при возникновении временной ошибки.
@@ -53,16 +140,16 @@ class DatabaseService:
         self._ensure_connector()
 
         # Параметры управления соединениями не передаются напрямую в коннектор
-        internal_keys = {"pool_size", "persistent", "max_retries"}
+        internal_keys = {"pool_size", "pool_reset_session", "persistent", "max_retries"}
         self._db_config = {k: v for k, v in db_config.items() if k not in internal_keys}
 
         self._persistent: bool = bool(db_config.get("persistent", False))
         self._max_retries: int = int(db_config.get("max_retries", 1))
 
-        pool_size = db_config.get("pool_size")
+        self._pool_size: int = int(db_config.get("pool_size") or 0)
+        self._pool_reset_session: bool = bool(db_config.get("pool_reset_session", True))
         self._pool: Optional[mysql.connector.pooling.MySQLConnectionPool] = None
-        if pool_size:
-            self._create_pool(int(pool_size))
+        self._pool_lock = threading.Lock()
 
         self._connection: Optional[mysql.connector.MySQLConnection] = None
 
@@ -86,19 +173,18 @@ class DatabaseService:
         DatabaseConnectionError
             Если библиотека ``mysql-connector-python`` не установлена.
         """
-        if mysql is None:
-            raise DatabaseConnectionError(
-                "Библиотека 'mysql-connector-python' не установлена"
-            ) from _IMPORT_ERROR
+        _mysql()
 
     def _create_pool(self, size: int) -> None:
         """Создаёт пул соединений указанного размера."""
         try:
-            self._pool = mysql.connector.pooling.MySQLConnectionPool(
-                pool_size=size, **self._db_config
+            self._pool = _mysql().pooling.MySQLConnectionPool(
+                pool_size=size,
+                pool_reset_session=self._pool_reset_session,
+                **self._db_config,
             )
             logger.debug("MySQL connection pool created with size %s", size)
-        except mysql.connector.Error as exc:
+        except _mysql().Error as exc:
             raise DatabaseConnectionError(
                 f"Не удалось создать пул соединений: {exc}"
             ) from exc
@@ -107,33 +193,49 @@ class DatabaseService:
         """Определяет, относится ли ошибка подключения к временным."""
         errno = getattr(exc, "errno", None)
         transient_codes = {
-            mysql.connector.errorcode.CR_SERVER_GONE_ERROR,
-            mysql.connector.errorcode.CR_SERVER_LOST,
-            mysql.connector.errorcode.CR_CONNECTION_ERROR,
-            mysql.connector.errorcode.CR_CONN_HOST_ERROR,
+            _mysql().errorcode.CR_SERVER_GONE_ERROR,
+            _mysql().errorcode.CR_SERVER_LOST,
+            _mysql().errorcode.CR_CONNECTION_ERROR,
+            _mysql().errorcode.CR_CONN_HOST_ERROR,
         }
         return errno in transient_codes
 
     def _acquire_connection(self):
         """Получить соединение из пула, постоянное или новое."""
-        if self._pool is not None:
-            logger.debug("Acquire connection from pool")
-            return self._pool.get_connection()
+        if self._pool_size:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._create_pool(self._pool_size)
+            try:
+                logger.debug("Acquire connection from pool")
+                return self._pool.get_connection()
+            except _mysql().errors.PoolError:
+                # Все соединения пула заняты — работаем через отдельное соединение
+                logger.debug("Connection pool exhausted, open transient connection")
+                return _mysql().connect(**self._db_config)
         if self._persistent:
-            if self._connection is None or not self._connection.is_connected():
+            if self._connection is None:
                 logger.debug("Open persistent connection")
-                self._connection = mysql.connector.connect(**self._db_config)
+                self._connection = _mysql().connect(**self._db_config)
             else:
-                logger.debug("Reuse persistent connection")
+                # Лёгкая проверка живости; при обрыве коннектор переподключится сам
+                logger.debug("Ping persistent connection")
+                self._connection.ping(reconnect=True, attempts=1)
             return self._connection
         logger.debug("Open transient connection")
-        return mysql.connector.connect(**self._db_config)
+        return _mysql().connect(**self._db_config)
 
     def _release_connection(self, conn) -> None:
         """Закрыть или вернуть соединение в пул."""
-        if self._pool is not None:
+        if self._pool_size:
+            # Соединение пула возвращается в пул, отдельное — закрывается
             logger.debug("Return connection to pool")
+            pool = getattr(conn, "_cnx_pool", None)
             conn.close()
+            if pool is not None and pool is not self._pool:
+                # Пул закрыт в close(), пока соединение было занято: оно
+                # вернулось в пул, которым уже никто не пользуется
+                self._close_pool(pool)
         elif not self._persistent:
             logger.debug("Close transient connection")
             conn.close()
@@ -149,7 +251,7 @@ class DatabaseService:
                 conn = self._acquire_connection()
                 logger.debug("MySQL connection opened")
                 return conn
-            except mysql.connector.Error as exc:
+            except _mysql().Error as exc:
                 if attempt < attempts and self._is_transient_error(exc):
                     logger.warning("Transient DB error: %s", exc)
                     time.sleep(1)
@@ -170,6 +272,34 @@ class DatabaseService:
             logger.debug("Release DB connection")
             self._release_connection(conn)
 
+    def close(self) -> None:
+        """Закрыть постоянное соединение и свободные соединения пула."""
+        if self._connection is not None:
+            logger.debug("Close persistent connection")
+            try:
+                self._connection.close()
+            except _mysql().Error as exc:
+                logger.warning("Error while closing DB connection: %s", exc)
+            self._connection = None
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            logger.debug("Close connection pool")
+            self._close_pool(pool)
+
+    @staticmethod
+    def _close_pool(pool) -> None:
+        """Закрыть свободные соединения пула ``pool``.
+
+        Занятые соединения закрываются в ``_release_connection``, когда их
+        вернут в уже закрытый пул.
+        """
+        try:
+            # Публичного метода закрытия у MySQLConnectionPool нет
+            pool._remove_connections()
+        except _mysql().Error as exc:
+            logger.warning("Error while closing DB connection pool: %s", exc)
+
     def check_connection(self) -> None:
         """Проверить корректность параметров подключения."""
         try:
@@ -202,7 +332,7 @@ class DatabaseService:
                     result = {slug: name for slug, name in cursor.fetchall()}
                     logger.debug("Terms fetched: %s", result)
                     return result
-        except mysql.connector.Error as exc:
+        except _mysql().Error as exc:
             raise DatabaseConnectionError(
                 f"Не удалось подключиться к базе данных: {exc}"
             ) from exc
@@ -211,66 +341,96 @@ class DatabaseService:
         """\
         Получает данные товаров для указанных SKU.
         Возвращает словарь ``product_id -> данные``.
+
+        Запросы выполняются через подготовленные (server-side prepared)
+        выражения партиями по :data:`SKU_BATCH_SIZE` SKU, поэтому сервер
+        разбирает текст запроса один раз для каждой длины партии.
         """
         if not skus:
             return {}
 
+        sku_list = list(skus)
         try:
-            logger.debug("Fetching products for SKUs: %s", skus)
+            logger.debug("Fetching products for SKUs: %s", sku_list)
             with self._connect() as conn:
-                with conn.cursor(dictionary=True) as cursor:
-                    placeholders = ",".join(["%s"] * len(skus))
-                    # Загружаем вариации продуктов с указанными SKU
-                    query = f"""
-                        SELECT p.ID, p.post_title, p.post_parent, pm.meta_key, pm.meta_value
-                        FROM wp_posts p
-                        JOIN wp_postmeta pm ON p.ID = pm.post_id
-                        WHERE (pm.meta_key IN ('_sku', '_price', '_regular_price', '_sale_price',
-                                              '_product_attributes', '_variation_description', '_stock')
-                               OR pm.meta_key LIKE 'attribute_%')
-                          AND p.post_type = 'product_variation'
-                          AND pm.post_id IN (
-                            SELECT post_id FROM wp_postmeta WHERE meta_key = '_sku' AND meta_value IN ({placeholders})
-                          )
-                    """
-                    cursor.execute(query, list(skus))
-
-                    # Собираем значения мета-полей по каждой вариации
+                with conn.cursor(prepared=True, dictionary=True) as cursor:
+                    # Собираем значения мета-полей по каждой вариации.
+                    # Строки читаем порциями, чтобы не держать в памяти весь
+                    # результат при больших списках SKU.
                     products: Dict[int, Dict] = {}
                     parent_ids = set()
-                    for row in cursor.fetchall():
-                        pid = row['ID']
-                        if pid not in products:
-                            products[pid] = {
-                                'id': pid,
-                                'parent': row['post_parent'],
-                                'meta': {},
-                                'title': row['post_title']
+                    for batch in _batched(sku_list, SKU_BATCH_SIZE):
+                        # Загружаем вариации продуктов с указанными SKU
+                        cursor.execute(_products_query(len(batch)), batch)
+                        for rows in iter(lambda: cursor.fetchmany(FETCH_BATCH_SIZE), []):
+                            for row in rows:
+                                pid = row['ID']
+                                entry = products.get(pid)
+                                if entry is None:
+                                    entry = products[pid] = {
+                                        'id': pid,
+                                        'parent': row['post_parent'],
+                                        'meta': {},
+                                        'title': row['post_title']
+                                    }
+                                    parent_ids.add(row['post_parent'])
+                                entry['meta'][row['meta_key']] = row['meta_value']
+
+                    # Подгружаем родительские записи товаров
+                    parents: Dict[int, Dict] = {}
+                    for batch in _batched(list(parent_ids), SKU_BATCH_SIZE):
+                        cursor.execute(_parents_query(len(batch)), batch)
+                        for row in cursor.fetchall():
+                            parents[row['ID']] = {
+                                'title': row['post_title'],
+                                'content': row['post_content'],
                             }
-                        products[pid]['meta'][row['meta_key']] = row['meta_value']
-                        parent_ids.add(row['post_parent'])
-
-                    if parent_ids:
-                        # Подгружаем родительские записи товаров
-                        parent_query = (
-                            "SELECT ID, post_title, post_content FROM wp_posts WHERE ID IN ("
-                            f"{','.join(map(str, parent_ids))})"
-                        )
-                        cursor.execute(parent_query)
-                        parents = {
-                            row['ID']: {'title': row['post_title'], 'content': row['post_content']}
-                            for row in cursor.fetchall()
-                        }
-                        for product in products.values():
-                            parent = parents.get(product['parent'])
-                            if parent:
-                                product['base_title'] = parent['title']
-                                product['content'] = parent['content']
+                    for product in products.values():
+                        parent = parents.get(product['parent'])
+                        if parent:
+                            product['base_title'] = parent['title']
+                            product['content'] = parent['content']
 
                     logger.debug("Products fetched: %s", list(products.keys()))
                     return products
-        except mysql.connector.Error as exc:
+        except _mysql().Error as exc:
             raise DatabaseConnectionError(
                 f"Не удалось подключиться к базе данных: {exc}"
             ) from exc
 
+
+def get_shared_service(db_config: Dict) -> DatabaseService:
+    """Возвращает общий для процесса сервис для конфигурации ``db_config``.
+
+    Сервис работает через пул соединений (``DEFAULT_POOL_SIZE``, если
+    ``pool_size`` не задан) и может использоваться из нескольких потоков,
+    поэтому повторные генерации не тратят время на установку соединения.
+    Ключ ``persistent`` игнорируется: одно соединение нельзя делить между
+    потоками.
+
+    Raises
+    ------
+    DatabaseConnectionError
+        Если библиотека ``mysql-connector-python`` не установлена.
+    """
+    config = {k: v for k, v in db_config.items() if k != "persistent"}
+    config.setdefault("pool_size", DEFAULT_POOL_SIZE)
+    key = json.dumps(config, sort_keys=True, default=str)
+    with _shared_services_lock:
+        service = _shared_services.get(key)
+        if service is None:
+            service = _shared_services[key] = DatabaseService(config)
+        return service
+
+
+def close_shared_services() -> None:
+    """Закрывает и забывает все сервисы :func:`get_shared_service`.
+
+    Вызывается после смены настроек БД, чтобы пулы со старыми параметрами не
+    удерживали соединения с сервером.
+    """
+    with _shared_services_lock:
+        services = list(_shared_services.values())
+        _shared_services.clear()
+    for service in services:
+        service.close()
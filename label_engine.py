@@ -9,26 +9,41 @@ from PIL import Image
 import os
 import re
 import io
+import mmap
 import requests
 import json
 from reportlab.graphics.shapes import Drawing
 from reportlab.graphics.barcode import createBarcodeDrawing
 from reportlab.graphics import renderPDF
-from database_service import DatabaseService, DatabaseConnectionError
+from database_service import DatabaseService, DatabaseConnectionError, get_shared_service
 from pathlib import Path
+from functools import lru_cache
+from itertools import groupby
+from typing import Container
 import logging
 
 # Логгер модуля используется для вывода предупреждений и ошибок.
 logger = logging.getLogger(__name__)
+# Отдельный логгер для отладки разбора замеров (см. logging_setup).
+measurement_logger = logging.getLogger("measurements")
 
 # === НАСТРОЙКИ ===
 
 # Connection configuration will be supplied at runtime.
 
 def load_skus_from_file(filepath):
-    """Return SKU list from text file."""
-    with open(filepath, "r", encoding="utf-8") as f:
-        return [line.strip() for line in f if line.strip()]
+    """Return SKU list from text file.
+
+    The file is memory-mapped and decoded straight from the mapping, then
+    split into lines in C; surrounding whitespace is stripped and empty
+    lines are skipped.
+    """
+    with open(filepath, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            text = str(mapped, "utf-8")
+    return list(filter(None, map(str.strip, text.splitlines())))
 
 # Значения по умолчанию для настроек PDF-генератора
 DEFAULT_OUTPUT_FILE = "labels.pdf"
@@ -43,6 +58,21 @@ DEFAULT_BOTTOM_MARGIN_MM = 0
 DEFAULT_TOP_MARGIN_MM = 2
 DEFAULT_LABELS_PER_PAGE = 3
 
+# Мета-ключи размера в порядке приоритета и их множество для исключения
+# из списка прочих атрибутов
+_SIZE_KEYS = ("attribute_pa_razmer", "attribute_pa_size", "attribute_pa_rost")
+_SIZE_KEY_SET = frozenset(_SIZE_KEYS)
+
+# Подписи для атрибутов товара (ключ без префикса ``attribute_pa_``)
+_ATTRIBUTE_TRANSLATION = {
+    "color": "Цвет",
+    "uzor": "Узор",
+    "patterns": "Узор",
+    "material": "Материал",
+    "type": "Тип",
+    # при желании добавляй свои подписи
+}
+
 # === РЕГИСТРАЦИЯ ШРИФТОВ ===
 # Полные пути к файлам шрифтов. Используем абсолютные пути, чтобы модуль
 # работал корректно вне зависимости от текущей рабочей директории.
@@ -103,21 +133,22 @@ def extract_measurements(text: str, target_size: str | None) -> str | None:
     str | None
         Отформатированная строка замеров или ``None``.
     """
-    log_lines = []
+    debug = measurement_logger.isEnabledFor(logging.DEBUG)
     if not target_size:
-        log_lines.append("[SKIP] Нет значения размера\n")
-        write_measurement_log(log_lines)
+        if debug:
+            measurement_logger.debug("[SKIP] Нет значения размера")
         return None
 
     block = re.search(r"Замеры:(.*?)(?:\n\n|$)", text, re.DOTALL | re.IGNORECASE)
     if not block:
-        log_lines.append(f"[SKIP] Нет блока 'Замеры:' для размера {target_size}\n")
-        write_measurement_log(log_lines)
+        if debug:
+            measurement_logger.debug("[SKIP] Нет блока 'Замеры:' для размера %s", target_size)
         return None
 
     lines = block.group(1).splitlines()
     for line in lines:
-        log_lines.append(f"Проверка строки: {line}\n")
+        if debug:
+            measurement_logger.debug("Проверка строки: %s", line)
         match_line = re.match(rf"\s*{target_size}\s*\((.*?)\)", line)
         if match_line:
             inner_text = match_line.group(1).strip()
@@ -143,19 +174,14 @@ def extract_measurements(text: str, target_size: str | None) -> str | None:
                 if kmatch:
                     parts.append(f"{label} {kmatch.group(1).strip()}")
             result = ", ".join(parts) if parts else None
-            log_lines.append(f"→ Найдено: {result}\n")
-            write_measurement_log(log_lines)
+            if debug:
+                measurement_logger.debug("→ Найдено: %s", result)
             return result
 
-    log_lines.append("[SKIP] Не найдено совпадений по размеру\n")
-    write_measurement_log(log_lines)
+    if debug:
+        measurement_logger.debug("[SKIP] Не найдено совпадений по размеру")
     return None
 
-def write_measurement_log(log_lines: list[str]) -> None:
-    """Записывает отладочную информацию по замерам в файл."""
-    with open("measurements.log", "a", encoding="utf-8") as log:
-        log.writelines(log_lines)
-
 def extract_age_as_size(text: str) -> str | None:
     """Пытается определить размер по упоминанию возраста."""
     match = re.search(r"Возраст:?\s*([\d\-–\s]+лет?)", text, re.IGNORECASE)
@@ -188,27 +214,82 @@ def load_care_image(path_or_url: str | None) -> ImageReader | None:
     except Exception:
         return None
 
-def extract_other_attributes(meta: dict, exclude_keys: list[str], slug_to_label: dict[str, str]) -> str | None:
-    """Формирует строку дополнительных атрибутов товара."""
+def extract_other_attributes(
+    meta: dict, exclude_keys: Container[str], slug_to_label: dict[str, str]
+) -> str | None:
+    """Формирует строку дополнительных атрибутов товара.
+
+    ``exclude_keys`` проверяется оператором ``in``, поэтому лучше передавать
+    множество (например, :data:`_SIZE_KEY_SET`).
+    """
+    attr_items = [
+        (key, value.strip())
+        for key, value in meta.items()
+        if key.startswith("attribute_") and value and value.strip() and key not in exclude_keys
+    ]
+
     attributes = []
-    translation = {
-        "color": "Цвет",
-        "uzor": "Узор",
-        "patterns": "Узор",
-        "material": "Материал",
-        "type": "Тип",
-        # при желании добавляй свои подписи
-    }
-
-    for key, value in meta.items():
-        if key.startswith("attribute_") and key not in exclude_keys and value.strip():
-            attr_key = key.replace("attribute_pa_", "").replace("attribute_", "").lower()
-            translated_name = translation.get(attr_key, attr_key.capitalize())
-            human_value = slug_to_label.get(value.strip(), value.strip())
-            attributes.append(f"{translated_name}: {human_value}")
+    for key, value in attr_items:
+        attr_key = key.replace("attribute_pa_", "").replace("attribute_", "").lower()
+        translated_name = _ATTRIBUTE_TRANSLATION.get(attr_key, attr_key.capitalize())
+        human_value = slug_to_label.get(value, value)
+        attributes.append(f"{translated_name}: {human_value}")
 
     return ", ".join(attributes) if attributes else None
-    
+
+
+@lru_cache(maxsize=1024)
+def _fast_split(text: str, font: str, size: float, max_width: float) -> tuple[str, ...]:
+    """Разбивает строку по ширине этикетки, пропуская разбор коротких строк.
+
+    Если строка без переносов целиком помещается в ``max_width``, она
+    возвращается без вызова :func:`simpleSplit`, с теми же схлопнутыми
+    пробелами, что дал бы он. Результат кэшируется: постоянные строки
+    (импортер, дата изготовления и т.п.) повторяются на каждой этикетке.
+    """
+    if "\n" not in text:
+        line = " ".join(text.split())
+        if not line:
+            return ()
+        if pdfmetrics.stringWidth(line, font, size) <= max_width:
+            return (line,)
+    return tuple(simpleSplit(text, font, size, max_width))
+
+
+def _sku_key(sku: str | None) -> str:
+    """Приводит артикул к виду, в котором его сравнивает MySQL.
+
+    Сравнение строк в БД не учитывает регистр и завершающие пробелы, поэтому
+    товар может вернуться с ``_sku``, записанным иначе, чем в запросе.
+    """
+    return (sku or "").rstrip().casefold()
+
+
+def split_sku_copies(skus) -> tuple[list[str], dict[str, int]]:
+    """Разделяет список SKU на уникальные артикулы и заданное число копий.
+
+    Parameters
+    ----------
+    skus : Iterable[str | tuple[str, int]]
+        Артикулы либо пары ``(sku, count)``.
+
+    Returns
+    -------
+    tuple[list[str], dict[str, int]]
+        Уникальные артикулы в исходном порядке и словарь ``sku -> копии``
+        для элементов, заданных парой.
+    """
+    order: dict[str, None] = {}
+    copies: dict[str, int] = {}
+    for item in skus:
+        if isinstance(item, tuple):
+            sku, count = item
+            copies[sku] = copies.get(sku, 0) + int(count)
+        else:
+            sku = item
+        order[sku] = None
+    return list(order), copies
+
 
 def get_product_quantity(product: dict, use_stock_quantity: bool = True) -> int:
     """Возвращает количество этикеток, которое нужно напечатать."""
@@ -271,26 +352,45 @@ class LabelGenerator:
         products_list = list(products.values())
 
         # Собираем все slug-значения атрибутов для последующего перевода
-        all_slugs = set()
-        for product in products.values():
-            for key, value in product['meta'].items():
-                if key.startswith("attribute_") and value.strip():
-                    all_slugs.add(value.strip())
+        prefix = "attribute_"
+        all_slugs = {
+            value.strip()
+            for product in products_list
+            for key, value in product['meta'].items()
+            if key.startswith(prefix) and value and value.strip()
+        }
 
         # Получаем человекочитаемые названия терминов через сервис базы данных
         slug_to_label = self.db_service.get_term_labels(all_slugs)
 
-        for idx, product in enumerate(products_list):
-            # Рассчитываем позицию этикетки на странице
-            pos_in_page = idx % self.labels_per_page
-            x = pos_in_page * self.label_width
-
-            # При переходе на новую строку выводим новую страницу
-            if pos_in_page == 0 and idx != 0:
-                buffer.showPage()
-
-            center_x = x + self.label_width / 2
-            current_y = self.page_height - self.top_margin
+        # Величины, не зависящие от товара, вычисляем один раз до цикла
+        label_width = self.label_width
+        labels_per_page = self.labels_per_page
+        font_size = self.font_size
+        start_y = self.page_height - self.top_margin
+        max_text_width = label_width - 8
+        bc_h_mm = self.barcode_height / mm  # высота штрихкода в мм
+        lbl_w_mm = label_width / mm
+        text_area_mm = (self.page_height - self.top_margin - self.bottom_margin) / mm
+        pad_mm = 2  # отступы штрихкода слева и справа
+        usable_w_pt = (lbl_w_mm - 2 * pad_mm) * mm
+        care_img_height = 4
+        care_img_extra = 2
+        care_h_pt = care_img_height * mm
+        bc_extra = 2
+
+        # Локальные ссылки на методы canvas экономят поиск атрибутов в цикле
+        draw = buffer.drawString
+        drawC = buffer.drawCentredString
+        setFont = buffer.setFont
+
+        # Готовые штрихкоды по SKU: повторяющиеся товары не пересоздают Drawing
+        barcode_cache: dict[str, Drawing] = {}
+
+        def draw_label(product: dict, x: float) -> None:
+            """Рисует одну этикетку товара с левым краем в точке ``x``."""
+            center_x = x + label_width / 2
+            current_y = start_y
 
             sku = product['meta'].get('_sku', 'N/A')
             price = (
@@ -303,13 +403,11 @@ class LabelGenerator:
             description = product.get('content', '')
 
             # Определяем значение размера
-            size_val = ""
-            for key in ["attribute_pa_razmer", "attribute_pa_size", "attribute_pa_rost"]:
-                if key in product['meta'] and product['meta'][key]:
-                    size_val = product['meta'][key]
-                    break
-            if not size_val:
-                size_val = extract_age_as_size(description)
+            meta = product['meta']
+            size_val = (
+                next((meta[k] for k in _SIZE_KEYS if meta.get(k)), "")
+                or extract_age_as_size(description)
+            )
 
             art_and_size = f"Арт: {sku}"
 
@@ -324,13 +422,12 @@ class LabelGenerator:
                 except ValueError:
                     return False
 
-            size_attr_keys = ["attribute_pa_razmer", "attribute_pa_size", "attribute_pa_rost"]
             if size_val:
                 label = "Размер" if is_size_value(size_val) else "Рост"
                 art_and_size += f" {label}: {size_val}"
 
             other_attributes = extract_other_attributes(
-                product['meta'], exclude_keys=size_attr_keys, slug_to_label=slug_to_label
+                meta, exclude_keys=_SIZE_KEY_SET, slug_to_label=slug_to_label
             )
             if other_attributes:
                 art_and_size += f", {other_attributes}"
@@ -365,7 +462,7 @@ class LabelGenerator:
 
             final_lines = []
             for (font, rawtext, align) in lines_defs:
-                sublines = simpleSplit(rawtext, font, self.font_size, self.label_width - 8)
+                sublines = _fast_split(rawtext, font, font_size, max_text_width)
                 for idx_sub, sline in enumerate(sublines):
                     is_care = ("уход" in rawtext.lower()) and (idx_sub == len(sublines) - 1)
                     is_price = ("цена:" in rawtext.lower()) and (idx_sub == len(sublines) - 1)
@@ -374,20 +471,15 @@ class LabelGenerator:
             text_lines_count = len(final_lines)
 
             has_care_img = any(line[3] for line in final_lines) and care_img
-            care_img_height = 4
-            care_img_extra = 2
-
             has_barcode = any(line[4] for line in final_lines)
-            bc_height = self.barcode_height / mm  # высота штрихкода в мм
-            bc_extra = 2
 
             physically_used_mm = 0
             if has_care_img:
                 physically_used_mm += care_img_height + care_img_extra
             if has_barcode:
-                physically_used_mm += bc_height + bc_extra
+                physically_used_mm += bc_h_mm + bc_extra
 
-            text_space_mm = (self.page_height - self.top_margin - self.bottom_margin) / mm - physically_used_mm
+            text_space_mm = text_area_mm - physically_used_mm
             if text_space_mm < 5:
                 text_space_mm = 5
             text_space_pts = text_space_mm * mm
@@ -405,86 +497,119 @@ class LabelGenerator:
 
             for (font, txt, align, is_care, is_price) in final_lines:
                 font_to_use = font
-                size_to_use = self.font_size
+                size_to_use = font_size
 
                 if is_price:
                     current_y -= 3 * mm
                     font_to_use = "DejaVuSans-Bold"
                     size_to_use = 8
 
-                buffer.setFont(font_to_use, size_to_use)
+                setFont(font_to_use, size_to_use)
 
                 if is_care and has_care_img:
                     # Рисуем заголовок "Рекомендации по уходу" и изображение
                     if align == "center":
-                        buffer.drawCentredString(center_x, current_y, txt)
+                        drawC(center_x, current_y, txt)
                     else:
-                        buffer.drawString(x + 4, current_y, txt)
+                        draw(x + 4, current_y, txt)
 
                     current_y -= 1 * mm  # небольшой отступ перед картинкой
 
-                    img_height_pt = care_img_height * mm
-                    current_y -= img_height_pt
+                    current_y -= care_h_pt
                     buffer.drawImage(
-                        care_img, x + 4, current_y, width=(self.label_width - 8), height=img_height_pt
+                        care_img, x + 4, current_y, width=max_text_width, height=care_h_pt
                     )
                 else:
                     if align == "center":
-                        buffer.drawCentredString(center_x, current_y, txt)
+                        drawC(center_x, current_y, txt)
                     else:
-                        buffer.drawString(x + 4, current_y, txt)
+                        draw(x + 4, current_y, txt)
 
                     current_y -= line_height
 
                 if is_price and has_barcode:
-                    barcode_height_mm = self.barcode_height / mm
-                    left_right_padding_mm = 2
-
-                    usable_width_mm = (self.label_width / mm) - 2 * left_right_padding_mm
-
-                    bc = createBarcodeDrawing(
-                        "Code128",
-                        value=sku,
-                        barHeight=barcode_height_mm * mm,
-                        barWidth=1.2,
-                        humanReadable=False,
-                    )
-
-                    bc_width = bc.width
-                    scale_factor = (usable_width_mm * mm) / bc_width
-
-                    bc_x = x + left_right_padding_mm * mm + (
-                        (usable_width_mm * mm) - (bc_width * scale_factor)
-                    ) / 2
-                    bc_y = current_y - barcode_height_mm * mm
-
+                    bc = barcode_cache.get(sku)
+                    if bc is None:
+                        bc = createBarcodeDrawing(
+                            "Code128",
+                            value=sku,
+                            barHeight=self.barcode_height,
+                            barWidth=1.2,
+                            humanReadable=False,
+                        )
+                        # Масштаб по ширине задаём один раз в самом Drawing,
+                        # чтобы не сохранять и не восстанавливать состояние canvas
+                        bc.transform = (usable_w_pt / bc.width, 0, 0, 1, 0, 0)
+                        bc.width = usable_w_pt
+                        barcode_cache[sku] = bc
+
+                    bc_x = x + pad_mm * mm
+                    bc_y = current_y - self.barcode_height
+                    renderPDF.draw(bc, buffer, bc_x, bc_y)
+
+
+        # Подряд идущие копии одного товара рисуются один раз в PDF-форму
+        # (XObject) и затем размещаются на нужных позициях без повторной
+        # вёрстки текста и штрихкода.
+        position = 0
+        for _, group in groupby(products_list, key=id):
+            group = list(group)
+            product = group[0]
+            form_name = None
+            if len(group) > 1:
+                form_name = f"label{position}"
+                buffer.beginForm(form_name)
+                draw_label(product, 0)
+                buffer.endForm()
+
+            for _ in group:
+                # Рассчитываем позицию этикетки на странице
+                pos_in_page = position % labels_per_page
+                x = pos_in_page * label_width
+
+                # При переходе на новую строку выводим новую страницу
+                if pos_in_page == 0 and position != 0:
+                    buffer.showPage()
+
+                if form_name is None:
+                    draw_label(product, x)
+                else:
                     buffer.saveState()
-                    buffer.translate(bc_x, bc_y)
-                    buffer.scale(scale_factor, 1.0)
-                    renderPDF.draw(bc, buffer, 0, 0)
+                    buffer.translate(x, 0)
+                    buffer.doForm(form_name)
                     buffer.restoreState()
+                position += 1
 
-        if len(products_list) % self.labels_per_page != 0:
+        if len(products_list) % labels_per_page != 0:
             buffer.showPage()
 
         buffer.save()
         # Предупреждение о пути сгенерированного PDF-файла.
         logger.warning("Сгенерировано: %s", self.output_file)
 
-    logger.debug("▶ Запуск генерации: %s", skus)
-    def generate_labels_entry(self, skus: list[str]) -> None:
+    def generate_labels_entry(self, skus: list[str | tuple[str, int]]) -> None:
         """\
         Точка входа для генерации этикеток по списку SKU.
 
         Параметры
         ----------
-        skus : list[str]
+        skus : list[str | tuple[str, int]]
             Список артикулов, для которых нужно напечатать этикетки.
+            Элемент ``(sku, count)`` задаёт точное число копий вместо
+            количества на складе; каждый артикул запрашивается из БД один раз.
         Сервис БД передается через конструктор.
         """
+        logger.debug("▶ Запуск генерации: %s", skus)
+        sku_list, requested = split_sku_copies(skus)
+        # Число копий ищется по нормализованному артикулу: ``_sku`` товара
+        # может отличаться от запрошенного регистром и пробелами
+        copies: dict[str, int] = {}
+        for sku, count in requested.items():
+            key = _sku_key(sku)
+            copies[key] = copies.get(key, 0) + count
         # Загружаем данные товаров из базы
         try:
-            products = self.db_service.get_products_by_skus(skus)
+            products = self.db_service.get_products_by_skus(sku_list)
         except DatabaseConnectionError as exc:
             # Ошибка подключения к БД отображается в логах.
             logger.error("[DB ERROR] %s", exc)
@@ -493,7 +618,9 @@ class LabelGenerator:
         # Расширяем список товаров с учётом количества
         expanded_products: list[dict] = []
         for product in products.values():
-            qty = get_product_quantity(product, self.use_stock_quantity)
+            qty = copies.get(_sku_key(product['meta'].get('_sku')))
+            if qty is None:
+                qty = get_product_quantity(product, self.use_stock_quantity)
             expanded_products.extend([product] * qty)
 
         mapping = {i: p for i, p in enumerate(expanded_products)}
@@ -501,8 +628,12 @@ class LabelGenerator:
 
 
 def generate_labels_entry(skus, settings, db_config):
-    """Высокоуровневая функция запуска генерации этикеток."""
-    db_service = DatabaseService(db_config)
+    """Высокоуровневая функция запуска генерации этикеток.
+
+    Соединения с БД берутся из пула общего сервиса (:func:`get_shared_service`),
+    поэтому повторные вызовы не устанавливают новое подключение.
+    """
+    db_service = get_shared_service(db_config)
     generator = LabelGenerator(settings, db_service)
     try:
         generator.generate_labels_entry(skus)
@@ -5,7 +5,11 @@ import logging
 from logging.handlers import RotatingFileHandler
 
 
-def configure_logging(log_file: str = "app.log") -> None:
+def configure_logging(
+    log_file: str = "app.log",
+    measurements_log: str = "measurements.log",
+    measurements_level: int = logging.INFO,
+) -> None:
     """Настроить глобальный логгер приложения.
 
     Создаёт ``RotatingFileHandler`` объёмом до 1 МБ с тремя резервными
@@ -14,10 +18,21 @@ def configure_logging(log_file: str = "app.log") -> None:
     Корневому логгеру присваивается уровень ``DEBUG``. Дополнительно
     устанавливается ``StreamHandler`` для вывода сообщений в консоль.
 
+    Логгер ``measurements`` (разбор замеров в :mod:`label_engine`) пишет
+    только в отдельный файл с ротацией и не дублирует сообщения в общий лог.
+    Его уровень задаётся отдельно от корневого: по умолчанию ``INFO``, так
+    что отладочный разбор замеров не выполняется, пока его не включат
+    уровнем ``DEBUG``.
+
     Parameters
     ----------
     log_file : str
         Путь к файлу, в который будут сохраняться логи.
+    measurements_log : str
+        Путь к файлу журнала разбора замеров.
+    measurements_level : int
+        Уровень логгера ``measurements``; ``logging.DEBUG`` включает
+        диагностику разбора замеров.
     """
     # Получаем корневой логгер и задаём ему уровень
     root_logger = logging.getLogger()
@@ -43,3 +58,16 @@ def configure_logging(log_file: str = "app.log") -> None:
     stream_handler.setFormatter(formatter)
     root_logger.addHandler(stream_handler)
 
+    # Отдельный файл для диагностики замеров
+    measurements_handler = RotatingFileHandler(
+        measurements_log,
+        maxBytes=1_000_000,
+        backupCount=3,
+        encoding="utf-8",
+    )
+    measurements_handler.setFormatter(formatter)
+    measurements_logger = logging.getLogger("measurements")
+    measurements_logger.addHandler(measurements_handler)
+    # Собственный уровень: иначе логгер наследует DEBUG корневого
+    measurements_logger.setLevel(measurements_level)
+    measurements_logger.propagate = False
@@ -1,29 +1,240 @@
-from PyQt5 import QtWidgets, QtGui, QtCore
+from PyQt5 import QtWidgets, QtGui, QtCore, sip
 import sys
 import os
-import json
-import tempfile
+import time
 import logging
+import threading
+from collections import OrderedDict, deque
 
 from logging_setup import configure_logging
 
 configure_logging()
 logger = logging.getLogger(__name__)
 
-try:
-    import mysql.connector
-    MYSQL_AVAILABLE = True
-except ModuleNotFoundError as exc:  # Коннектор MySQL не установлен
-    mysql = None  # type: ignore
-    MYSQL_AVAILABLE = False
-    MYSQL_IMPORT_ERROR = exc
-from config_loader import load_settings, load_db_config
-
-from preview_engine import generate_preview_pdf, convert_pdf_to_image
-from label_engine import generate_labels_entry
-from database_service import DatabaseConnectionError, DatabaseService
+from config_loader import load_settings, load_db_config, save_json
+
+from preview_engine import (
+    config_fingerprint,
+    get_cached_preview,
+    clear_preview_cache,
+    target_dpi,
+    PREVIEW_CACHE_TTL_S,
+    PREVIEW_DPI,
+)
+from label_engine import generate_labels_entry, load_skus_from_file
+from database_service import (
+    DatabaseConnectionError,
+    DatabaseService,
+    close_shared_services,
+    mysql_available,
+)
 from db_dialog import DBConfigDialog
 from label_settings import LabelSettingsDialog
+from preview_widget import PreviewWidget
+
+__all__ = ["run_gui", "LabelMakerApp"]
+
+# Наличие коннектора MySQL проверяется без его импорта: драйвер загружается
+# при первом обращении к БД
+MYSQL_AVAILABLE = mysql_available()
+
+# Режимы превью, соответствуют индексам в ``preview_mode``
+PREVIEW_MODE_LABEL = 0
+PREVIEW_MODE_PAGE = 1
+
+# Сколько готовых изображений превью хранить в окне
+PREVIEW_IMAGE_CACHE_MAX = 32
+
+# Период вывода накопленных сообщений лога, мс, и предельное число строк
+LOG_FLUSH_MS = 50
+LOG_MAX_BLOCKS = 2000
+
+# Число строк списка артикулов, раскладываемых за один проход
+SKU_LIST_BATCH_SIZE = 256
+
+# Задержка между последним выбором артикула или режима и построением превью, мс
+PREVIEW_DEBOUNCE_MS = 120
+
+# Сколько артикулов загруженного списка заранее прогревать в кэше превью
+# и пауза между ними, с
+PREWARM_MAX_SKUS = 200
+PREWARM_PAUSE_S = 0.05
+
+# Сколько секунд результат проверки подключения к БД считается актуальным
+DB_STATUS_TTL_S = 30
+
+# Таймаут подключения при проверке статуса БД, если он не задан в конфигурации, с
+DB_PROBE_TIMEOUT_S = 2
+
+
+def render_preview_image(skus, settings: dict, db_config: dict, settings_fp: str, db_fp: str,
+                         dpi: int = PREVIEW_DPI):
+    """Строит изображение превью для ``skus``.
+
+    Растр берётся из кэша :func:`get_cached_preview` (при промахе он
+    строится и кэшируется там же). Функция не обращается к виджетам и может
+    выполняться в рабочем потоке.
+
+    Returns
+    -------
+    tuple[QtGui.QImage, object]
+        Изображение и буфер с его пикселями. ``QImage`` ссылается на буфер
+        без копирования, поэтому вызывающий код обязан хранить буфер, пока
+        используется изображение.
+
+    Raises
+    ------
+    DatabaseConnectionError
+        При ошибке подключения к БД во время генерации.
+    RuntimeError
+        Если PDF не был сформирован или не содержит страниц.
+    """
+    # Пиксели берутся прямо из отображённого в память PPM без копирования
+    buffer, width, height = get_cached_preview(
+        skus, settings, db_config, settings_fp, db_fp, dpi
+    )
+    image_qt = QtGui.QImage(
+        sip.voidptr(buffer), width, height, width * 3, QtGui.QImage.Format_RGB888
+    )
+    return image_qt, buffer
+
+
+class PreviewWorkerSignals(QtCore.QObject):
+    """Сигналы :class:`PreviewWorker`.
+
+    Каждый сигнал несёт идентификатор задачи, по которому окно отбрасывает
+    результаты устаревших запросов.
+    """
+
+    finished = QtCore.pyqtSignal(int, str, QtGui.QImage, object)
+    db_error = QtCore.pyqtSignal(int, str)
+    failed = QtCore.pyqtSignal(int, str)
+
+
+class PreviewWorker(QtCore.QRunnable):
+    """Фоновая задача построения превью для ``QThreadPool``.
+
+    Настройки копируются при создании задачи, поэтому их изменение в окне
+    не влияет на уже запущенную генерацию. Результат передаётся сигналами
+    объекта ``signals``; они доставляются в GUI-поток через очередь событий.
+    """
+
+    def __init__(self, job_id: int, key: str, skus, settings: dict, db_config: dict,
+                 settings_fp: str, db_fp: str, dpi: int):
+        super().__init__()
+        self.signals = PreviewWorkerSignals()
+        self.job_id = job_id
+        self.key = key
+        self.skus = skus
+        self.settings = dict(settings)
+        self.db_config = dict(db_config)
+        self.settings_fp = settings_fp
+        self.db_fp = db_fp
+        self.dpi = dpi
+
+    def run(self) -> None:
+        """Выполняет построение превью и сообщает результат сигналами."""
+        try:
+            image, buffer = render_preview_image(
+                self.skus,
+                self.settings,
+                self.db_config,
+                self.settings_fp,
+                self.db_fp,
+                self.dpi,
+            )
+        except DatabaseConnectionError as exc:
+            self.signals.db_error.emit(self.job_id, str(exc))
+        except Exception as exc:
+            self.signals.failed.emit(self.job_id, str(exc))
+        else:
+            self.signals.finished.emit(self.job_id, self.key, image, buffer)
+
+
+class PreviewPrewarmJob(QtCore.QRunnable):
+    """Фоновое заполнение кэша превью для списка артикулов.
+
+    Превью строятся по одному с паузой ``PREWARM_PAUSE_S`` и сохраняются
+    в кэш :func:`get_cached_preview`; ничего не отображается. Задача
+    прекращается при установке ``cancel`` или при первой ошибке построения.
+    """
+
+    def __init__(self, requests, settings: dict, db_config: dict,
+                 settings_fp: str, db_fp: str, dpi: int, cancel: threading.Event):
+        super().__init__()
+        self.requests = requests
+        self.settings = dict(settings)
+        self.db_config = dict(db_config)
+        self.settings_fp = settings_fp
+        self.db_fp = db_fp
+        self.dpi = dpi
+        self.cancel = cancel
+
+    def run(self) -> None:
+        """Строит превью по очереди, пока задача не отменена."""
+        for skus in self.requests:
+            if self.cancel.is_set():
+                return
+            try:
+                get_cached_preview(
+                    skus, self.settings, self.db_config, self.settings_fp, self.db_fp, self.dpi
+                )
+            except Exception:
+                # Ошибка подключения к БД не доходит сюда как
+                # DatabaseConnectionError: generate_labels_entry её логирует, и
+                # превью не формируется. Такая ошибка повторится для всех
+                # артикулов, поэтому прогрев прекращается на первой же.
+                logger.debug("Preview prewarm stopped at %s", skus, exc_info=True)
+                return
+            time.sleep(PREWARM_PAUSE_S)
+
+
+class _WriteJsonJob(QtCore.QRunnable):
+    """Фоновая запись JSON-файла конфигурации.
+
+    Данные копируются при создании задачи, поэтому последующие изменения
+    словаря в окне не попадают в уже поставленную запись.
+    """
+
+    def __init__(self, path: str, data: dict):
+        super().__init__()
+        self.path = path
+        self.data = dict(data)
+
+    def run(self) -> None:
+        """Записывает ``data`` в ``path``."""
+        try:
+            save_json(self.path, self.data)
+        except OSError:
+            logger.exception("Failed to write %s", self.path)
+
+
+class DBStatusWorker(QtCore.QThread):
+    """Поток проверки подключения к БД.
+
+    Результат передаётся сигналом ``result``; соединение сигнала с окном
+    работает через очередь событий, поэтому слот выполняется в GUI-потоке.
+    """
+
+    result = QtCore.pyqtSignal(bool)
+
+    def __init__(self, service: DatabaseService, parent=None):
+        super().__init__(parent)
+        self._service = service
+
+    def run(self) -> None:
+        """Проверяет соединение и отправляет результат."""
+        try:
+            self._service.check_connection()
+            is_connected = True
+        except DatabaseConnectionError:
+            logger.error("Database connection failed")
+            is_connected = False
+        except Exception:
+            logger.exception("Unexpected error while checking DB connection")
+            is_connected = False
+        self.result.emit(is_connected)
+
 
 class LabelMakerApp(QtWidgets.QMainWindow):
     """Main application window for the label maker GUI."""
@@ -34,11 +245,38 @@ class LabelMakerApp(QtWidgets.QMainWindow):
         self.settings: dict = {}
         self.db_config: dict = {}
         self._db_loaded = False
+        # Пул фоновых задач и идентификатор последнего запроса превью;
+        # результаты задач с другим идентификатором не отображаются
+        self.pool = QtCore.QThreadPool.globalInstance()
+        self._current_job_id = 0
+        # (sku, режим, dpi) последнего запрошенного превью; повторный запрос
+        # того же превью не выполняется
+        self._last_preview_key: tuple[str, int, int] | None = None
+        # Флаг отмены текущего прогрева кэша превью
+        self._prewarm_cancel = threading.Event()
+        # LRU готовых превью: ключ -> (QImage, буфер пикселей этого QImage,
+        # time.monotonic() получения); записи старше PREVIEW_CACHE_TTL_S не
+        # показываются, как и растры кэша на диске
+        self._preview_images: OrderedDict[str, tuple[QtGui.QImage, object, float]] = OrderedDict()
+        # Буфер отображаемого изображения; QImage использует его без копии
+        self._preview_bytes = None
+        # Сервис с постоянным соединением для проверки статуса БД и поток проверки
+        self._db_service: DatabaseService | None = None
+        self._db_status_worker: DBStatusWorker | None = None
+        self._report_db_status = False
+        # Последний результат проверки БД: (time.monotonic(), подключено ли)
+        self._db_status_cache: tuple[float, bool] | None = None
+        # Однопоточный пул записи конфигурации: файлы пишутся в порядке
+        # постановки задач, не блокируя GUI-поток
+        self._write_pool = QtCore.QThreadPool(self)
+        self._write_pool.setMaxThreadCount(1)
 
         self._load_config()
         self._build_ui()
         if self._db_loaded:
-            self.update_db_status()
+            # Проверка подключения запускается после первой отрисовки окна
+            self.db_status_label.setText("⏳ Проверка…")
+            QtCore.QTimer.singleShot(0, self.update_db_status)
 
         # Последующая инициализация выполняется в отдельных методах
 
@@ -79,6 +317,8 @@ class LabelMakerApp(QtWidgets.QMainWindow):
             self.db_config = {}
             self._db_loaded = False
 
+        self._update_fingerprints()
+
     def _build_ui(self) -> None:
         """Создаёт элементы интерфейса и привязывает обработчики событий."""
 
@@ -92,7 +332,13 @@ class LabelMakerApp(QtWidgets.QMainWindow):
 
         # Список SKU
         self.sku_list = QtWidgets.QListWidget()
-        self.sku_list.itemClicked.connect(self.preview_selected_sku)
+        # Строки одинаковой высоты и пакетная раскладка: большой список не
+        # измеряется построчно и раскладывается частями между событиями
+        self.sku_list.setUniformItemSizes(True)
+        self.sku_list.setLayoutMode(QtWidgets.QListView.Batched)
+        self.sku_list.setBatchSize(SKU_LIST_BATCH_SIZE)
+        self.sku_list.itemClicked.connect(self._schedule_preview)
+        self.sku_list.currentItemChanged.connect(self._schedule_preview)
         left_layout.addWidget(QtWidgets.QLabel("📦 Артикулы"))
         left_layout.addWidget(self.sku_list)
 
@@ -124,19 +370,31 @@ class LabelMakerApp(QtWidgets.QMainWindow):
 
         self.preview_mode = QtWidgets.QComboBox()
         self.preview_mode.addItems(["👁 Одна этикетка", "🗒️ Полный лист"])
-        self.preview_mode.currentIndexChanged.connect(self.update_preview)
+        self.preview_mode.currentIndexChanged.connect(self._schedule_preview)
         left_layout.addWidget(self.preview_mode)
 
+        # Таймер схлопывает серию кликов и переключений режима в одно превью
+        self._preview_timer = QtCore.QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.timeout.connect(self.update_preview)
+
         self.log_output = QtWidgets.QTextEdit()
         self.log_output.setReadOnly(True)
+        # Ограничиваем объём документа, чтобы раскладка не росла бесконечно
+        self.log_output.document().setMaximumBlockCount(LOG_MAX_BLOCKS)
+
+        # Сообщения копятся в буфере и выводятся пачкой по таймеру
+        self._log_buf: deque[str] = deque()
+        self._log_timer = QtCore.QTimer(self)
+        self._log_timer.setSingleShot(True)
+        self._log_timer.setInterval(LOG_FLUSH_MS)
+        self._log_timer.timeout.connect(self._flush_log)
         left_layout.addWidget(QtWidgets.QLabel("📝 Лог"))
         left_layout.addWidget(self.log_output)
 
         # Область превью
-        self.image_label = QtWidgets.QLabel("Превью")
-        self.image_label.setAlignment(QtCore.Qt.AlignCenter)
-        self.image_label.setStyleSheet("background-color: #f0f0f0; border: 1px solid #ccc;")
-        right_layout.addWidget(self.image_label)
+        self.preview_widget = PreviewWidget("Превью")
+        right_layout.addWidget(self.preview_widget)
 
         main_widget = QtWidgets.QWidget()
         main_layout.addLayout(left_layout, 3)
@@ -144,6 +402,38 @@ class LabelMakerApp(QtWidgets.QMainWindow):
         main_widget.setLayout(main_layout)
         self.setCentralWidget(main_widget)
 
+    def _log(self, message: str) -> None:
+        """Ставит сообщение в очередь вывода в ``log_output``.
+
+        Сообщения добавляются в виджет одним блоком в ``_flush_log`` не
+        чаще раза в ``LOG_FLUSH_MS`` мс.
+        """
+        self._log_buf.append(message)
+        if not self._log_timer.isActive():
+            self._log_timer.start()
+
+    def _flush_log(self) -> None:
+        """Выводит накопленные сообщения в ``log_output`` одной вставкой.
+
+        Текст вставляется курсором как обычный, без разбора как HTML, как это
+        делает ``append``. Лог прокручивается вниз, только если он уже был
+        прокручен до конца.
+        """
+        if not self._log_buf:
+            return
+        text = "\n".join(self._log_buf)
+        self._log_buf.clear()
+        if not self.log_output.document().isEmpty():
+            text = "\n" + text
+
+        scrollbar = self.log_output.verticalScrollBar()
+        at_bottom = scrollbar.value() == scrollbar.maximum()
+        cursor = QtGui.QTextCursor(self.log_output.document())
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.insertText(text)
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
     def load_sku_file(self):
         """Загружает текстовый файл со SKU и заполняет список.
 
@@ -159,11 +449,31 @@ class LabelMakerApp(QtWidgets.QMainWindow):
         """
         filepath, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Выберите файл SKU", "", "Text Files (*.txt)")
         if filepath:
-            with open(filepath, "r", encoding="utf-8") as f:
-                skus = [line.strip() for line in f if line.strip()]
-                self.sku_list.clear()
-                self.sku_list.addItems(skus)
-            self.log_output.append(f"✅ Загружено SKU: {len(skus)}")
+            skus = load_skus_from_file(filepath)
+            self._populate_sku_list(skus)
+            self._log(f"✅ Загружено SKU: {len(skus)}")
+            self._last_preview_key = None
+            QtCore.QTimer.singleShot(0, self._prewarm_previews)
+
+    def _populate_sku_list(self, skus: list[str]) -> None:
+        """Заменяет содержимое ``sku_list`` одним пакетом.
+
+        На время вставки отключаются перерисовка, сортировка и сигналы
+        виджета, чтобы большие списки не вызывали пересчёт раскладки и
+        запуск превью для каждого элемента.
+        """
+        sku_list = self.sku_list
+        sorting = sku_list.isSortingEnabled()
+        sku_list.setUpdatesEnabled(False)
+        sku_list.blockSignals(True)
+        sku_list.setSortingEnabled(False)
+        try:
+            sku_list.clear()
+            sku_list.addItems(skus)
+        finally:
+            sku_list.setSortingEnabled(sorting)
+            sku_list.blockSignals(False)
+            sku_list.setUpdatesEnabled(True)
 
     def preview_selected_sku(self):
         """Отрисовывает превью для выбранного SKU в текущем режиме.
@@ -175,19 +485,31 @@ class LabelMakerApp(QtWidgets.QMainWindow):
         Side effects
         ------------
         Вызывает отображение одной этикетки или целого листа и пишет
-        сообщение в ``log_output``.
+        сообщение в ``log_output``. Если это превью уже показано или
+        строится (``_last_preview_key``), ничего не делает.
         """
         sku = self.sku_list.currentItem().text()
         mode = self.preview_mode.currentIndex()
-        if mode == 0:
-            self.log_output.append(f"👁 Превью одной этикетки: {sku}")
+        key = (sku, mode, self._preview_dpi())
+        if key == self._last_preview_key:
+            return
+        self._last_preview_key = key
+        if mode == PREVIEW_MODE_LABEL:
+            self._log(f"👁 Превью одной этикетки: {sku}")
             self.show_label_preview(sku)
         else:
-            self.log_output.append(f"📄 Превью целого листа: {sku}")
+            self._log(f"📄 Превью целого листа: {sku}")
             self.show_page_preview(sku)
 
+    def _schedule_preview(self, *_args) -> None:
+        """Перезапускает таймер превью; сработает только последнее событие."""
+        self._preview_timer.start(PREVIEW_DEBOUNCE_MS)
+
     def update_preview(self):
-        """Обновляет превью выбранного SKU при смене режима.
+        """Обновляет превью выбранного SKU в текущем режиме.
+
+        Вызывается таймером ``_preview_timer`` после выбора артикула или
+        смены режима.
 
         Side effects
         ------------
@@ -197,49 +519,154 @@ class LabelMakerApp(QtWidgets.QMainWindow):
             self.preview_selected_sku()
 
     def show_label_preview(self, sku):
-        """Preview a single label for ``sku`` and clean up the temporary PDF."""
-        try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_pdf:
-                pdf_path = tmp_pdf.name
-
-            generate_preview_pdf(pdf_path, sku, self.settings, self.db_config, generate_labels_entry)
-            image = convert_pdf_to_image(pdf_path)
-            # Удаляем временный PDF-файл после конвертации,
-            # чтобы не оставлять лишних файлов на диске
-            os.unlink(pdf_path)
-            if image:
-                image_qt = QtGui.QImage(image.tobytes("raw", "RGB"), image.width, image.height, QtGui.QImage.Format_RGB888)
-                pixmap = QtGui.QPixmap.fromImage(image_qt)
-                self.image_label.setPixmap(pixmap.scaled(self.image_label.size(), QtCore.Qt.KeepAspectRatio))
-        except DatabaseConnectionError as exc:
-            # Пользователь получает всплывающее сообщение при проблеме
-            # с подключением к БД, также фиксируем её в логе.
-            QtWidgets.QMessageBox.critical(self, "Ошибка БД", str(exc))
-            self.log_output.append(f"❌ Ошибка БД: {exc}")
-        except Exception as e:
-            self.log_output.append(f"❌ Ошибка при превью: {e}")
+        """Preview a single label for ``sku``."""
+        self._show_preview(sku, PREVIEW_MODE_LABEL, self._preview_skus(sku, PREVIEW_MODE_LABEL))
 
     def show_page_preview(self, sku):
-        """Preview a full page filled with the same SKU and clean up the temporary PDF."""
-        try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_pdf:
-                pdf_path = tmp_pdf.name
-
-            count = self.settings.get("labels_per_page", 3)
-            generate_preview_pdf(pdf_path, [sku] * count, self.settings, self.db_config, generate_labels_entry)
-            image = convert_pdf_to_image(pdf_path)
-            # После конвертации удаляем временный файл превью
-            os.unlink(pdf_path)
-            if image:
-                image_qt = QtGui.QImage(image.tobytes("raw", "RGB"), image.width, image.height, QtGui.QImage.Format_RGB888)
-                pixmap = QtGui.QPixmap.fromImage(image_qt)
-                self.image_label.setPixmap(pixmap.scaled(self.image_label.size(), QtCore.Qt.KeepAspectRatio))
-        except DatabaseConnectionError as exc:
-            # Показываем ошибку подключения и логируем её.
-            QtWidgets.QMessageBox.critical(self, "Ошибка БД", str(exc))
-            self.log_output.append(f"❌ Ошибка БД: {exc}")
-        except Exception as e:
-            self.log_output.append(f"❌ Ошибка при превью: {e}")
+        """Preview a full page filled with the same SKU."""
+        self._show_preview(sku, PREVIEW_MODE_PAGE, self._preview_skus(sku, PREVIEW_MODE_PAGE))
+
+    def _preview_skus(self, sku: str, mode: int) -> list[tuple[str, int]]:
+        """Возвращает запрос превью ``sku`` в режиме ``mode``.
+
+        Пара ``(sku, count)``: товар запрашивается из БД один раз и
+        тиражируется. Для одной этикетки берётся одна копия, чтобы
+        складское количество не тиражировало её в превью.
+        """
+        if mode == PREVIEW_MODE_LABEL:
+            return [(sku, 1)]
+        return [(sku, self.settings.get("labels_per_page", 3))]
+
+    def _prewarm_previews(self) -> None:
+        """Запускает фоновый прогрев кэша превью для загруженного списка.
+
+        Превью строятся в текущем режиме для первых ``PREWARM_MAX_SKUS``
+        артикулов с низким приоритетом; предыдущий прогрев отменяется.
+        """
+        self._cancel_prewarm()
+        mode = self.preview_mode.currentIndex()
+        count = min(self.sku_list.count(), PREWARM_MAX_SKUS)
+        requests = [
+            self._preview_skus(self.sku_list.item(row).text(), mode) for row in range(count)
+        ]
+        if not requests:
+            return
+        job = PreviewPrewarmJob(
+            requests,
+            self.settings,
+            self.db_config,
+            self._settings_fp,
+            self._db_fp,
+            self._preview_dpi(),
+            self._prewarm_cancel,
+        )
+        self.pool.start(job, -1)
+
+    def _cancel_prewarm(self) -> None:
+        """Останавливает текущий прогрев кэша превью, если он выполняется."""
+        self._prewarm_cancel.set()
+        self._prewarm_cancel = threading.Event()
+
+    def _preview_cache_key(self, sku: str, mode: int, dpi: int) -> str:
+        """Возвращает ключ кэша превью для ``sku`` в режиме ``mode``.
+
+        В ключ входят отпечатки текущих настроек и конфигурации БД, поэтому
+        их изменение автоматически приводит к промаху кэша.
+        """
+        return f"{sku}|{mode}|{dpi}|{self._settings_fp}|{self._db_fp}"
+
+    def _preview_dpi(self) -> int:
+        """Разрешение превью, при котором страница вписывается в область превью."""
+        ratio = self.preview_widget.devicePixelRatioF()
+        size = self.preview_widget.size()
+        return target_dpi(size.width() * ratio, size.height() * ratio, self.settings)
+
+    def _update_fingerprints(self) -> None:
+        """Пересчитывает отпечатки ``settings`` и ``db_config``.
+
+        Вызывается только после загрузки конфигурации и принятия диалогов
+        настроек, а не при каждом построении превью.
+        """
+        self._settings_fp = config_fingerprint(self.settings)
+        self._db_fp = config_fingerprint(self.db_config)
+
+    def _show_preview(self, sku: str, mode: int, skus) -> None:
+        """Отображает превью из кэша или ставит задачу на его построение.
+
+        Parameters
+        ----------
+        sku : str
+            Артикул, для которого строится превью.
+        mode : int
+            Режим превью (``PREVIEW_MODE_LABEL`` или ``PREVIEW_MODE_PAGE``).
+        skus : str | list[str | tuple[str, int]]
+            Артикулы или пары ``(sku, count)`` для :func:`generate_preview_pdf`.
+
+        Side effects
+        ------------
+        Делает запрос текущим (``_current_job_id``), так что результаты
+        ранее запущенных задач больше не отображаются. При промахе кэша
+        ``_preview_images`` запускает :class:`PreviewWorker` в ``pool``;
+        результат отображается в ``_on_preview_ready``.
+        """
+        self._current_job_id += 1
+        dpi = self._preview_dpi()
+        key = self._preview_cache_key(sku, mode, dpi)
+        entry = self._preview_images.get(key)
+        if entry is not None:
+            image, buffer, received = entry
+            if time.monotonic() - received <= PREVIEW_CACHE_TTL_S:
+                self._preview_images.move_to_end(key)
+                self._display_preview(image, buffer)
+                return
+            # Устаревшее превью отпускает отображённый в память растр, чтобы
+            # его можно было перестроить
+            del self._preview_images[key]
+
+        worker = PreviewWorker(
+            self._current_job_id,
+            key,
+            skus,
+            self.settings,
+            self.db_config,
+            self._settings_fp,
+            self._db_fp,
+            dpi,
+        )
+        worker.signals.finished.connect(self._on_preview_ready)
+        worker.signals.db_error.connect(self._on_preview_db_error)
+        worker.signals.failed.connect(self._on_preview_failed)
+        self.pool.start(worker)
+
+    def _display_preview(self, image: QtGui.QImage, buffer) -> None:
+        """Показывает ``image``, удерживая буфер его пикселей."""
+        self._preview_bytes = buffer
+        self.preview_widget.set_image(image)
+
+    def _on_preview_ready(self, job_id: int, key: str, image: QtGui.QImage, buffer) -> None:
+        """Кэширует готовое превью и отображает его, если запрос ещё актуален."""
+        self._preview_images[key] = (image, buffer, time.monotonic())
+        while len(self._preview_images) > PREVIEW_IMAGE_CACHE_MAX:
+            self._preview_images.popitem(last=False)
+        if job_id == self._current_job_id:
+            self._display_preview(image, buffer)
+
+    def _on_preview_db_error(self, job_id: int, message: str) -> None:
+        """Сообщает об ошибке подключения к БД при построении превью."""
+        if job_id != self._current_job_id:
+            return
+        # Неудачное превью можно запросить повторно
+        self._last_preview_key = None
+        # Пользователь получает всплывающее сообщение при проблеме
+        # с подключением к БД, также фиксируем её в логе.
+        QtWidgets.QMessageBox.critical(self, "Ошибка БД", message)
+        self._log(f"❌ Ошибка БД: {message}")
+
+    def _on_preview_failed(self, job_id: int, message: str) -> None:
+        """Записывает в лог ошибку построения актуального превью."""
+        if job_id == self._current_job_id:
+            self._last_preview_key = None
+            self._log(f"❌ Ошибка при превью: {message}")
 
     def generate_pdf(self):
         """Генерирует итоговый PDF по всем SKU из списка.
@@ -260,7 +687,7 @@ class LabelMakerApp(QtWidgets.QMainWindow):
 
         try:
             generate_labels_entry(skus, self.settings, self.db_config)
-            self.log_output.append(f"✅ PDF сгенерирован: {self.settings['output_file']}")
+            self._log(f"✅ PDF сгенерирован: {self.settings['output_file']}")
             QtWidgets.QMessageBox.information(self, "Готово", f"PDF сгенерирован:\n{self.settings['output_file']}")
 
             if sys.platform == "win32":
@@ -269,7 +696,7 @@ class LabelMakerApp(QtWidgets.QMainWindow):
         except DatabaseConnectionError as exc:
             QtWidgets.QMessageBox.critical(self, "Ошибка БД", str(exc))
         except Exception as e:
-            self.log_output.append(f"❌ Ошибка генерации: {e}")
+            self._log(f"❌ Ошибка генерации: {e}")
             QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось сгенерировать PDF:\n{str(e)}")
 
     def show_db_config_dialog(self):
@@ -281,15 +708,25 @@ class LabelMakerApp(QtWidgets.QMainWindow):
 
         Side effects
         ------------
-        Сохраняет конфигурацию в файл, обновляет статус подключения и
-        пишет сообщение в ``log_output``.
+        Если конфигурация изменилась, ставит её запись в файл в фоновый
+        пул, обновляет статус подключения и пишет сообщение в ``log_output``.
         """
         dialog = DBConfigDialog(self, self.db_config)
         if dialog.exec_() == QtWidgets.QDialog.Accepted:
-            self.db_config = dialog.get_config()
-            with open("db_config.json", "w", encoding="utf-8") as f:
-                json.dump(self.db_config, f, indent=2)
-            self.log_output.append("💾 Настройки БД обновлены")
+            new_config = dialog.get_config()
+            if config_fingerprint(new_config) == self._db_fp:
+                return
+            self.db_config = new_config
+            self._reset_db_service()
+            close_shared_services()
+            self._update_fingerprints()
+            self._write_pool.start(_WriteJsonJob("db_config.json", self.db_config))
+            # Превью зависят от данных БД — сбрасываем закэшированные изображения
+            self._cancel_prewarm()
+            self._last_preview_key = None
+            self._preview_images.clear()
+            clear_preview_cache()
+            self._log("💾 Настройки БД обновлены")
             self.update_db_status()
 
     def show_label_settings_dialog(self):
@@ -301,55 +738,126 @@ class LabelMakerApp(QtWidgets.QMainWindow):
 
         Side effects
         ------------
-        Сохраняет новые параметры в файл и добавляет запись в лог.
+        Если параметры изменились, ставит их запись в файл в фоновый пул
+        и добавляет запись в лог.
         """
         dialog = LabelSettingsDialog(self, self.settings)
         if dialog.exec_() == QtWidgets.QDialog.Accepted:
-            self.settings = dialog.get_settings()
-            with open("settings.json", "w", encoding="utf-8") as f:
-                json.dump(self.settings, f, indent=2, ensure_ascii=False)
-            self.log_output.append("💾 Настройки этикетки обновлены")
-
-    def update_db_status(self) -> bool:
-        """Обновляет индикатор подключения к базе данных.
-
-        Возвращает ``True`` при успешном соединении, иначе ``False``.
-        Метод реализует отдельную ответственность — проверку состояния БД
-        и обновление визуального статуса. Любые непредвиденные ошибки
-        логируются, что упрощает диагностику проблем.
+            new_settings = dialog.get_settings()
+            if config_fingerprint(new_settings) == self._settings_fp:
+                return
+            self.settings = new_settings
+            self._update_fingerprints()
+            self._write_pool.start(_WriteJsonJob("settings.json", self.settings))
+            self._cancel_prewarm()
+            self._last_preview_key = None
+            self._preview_images.clear()
+            clear_preview_cache()
+            self._log("💾 Настройки этикетки обновлены")
+
+    def update_db_status(self, force: bool = False) -> None:
+        """Запускает фоновую проверку подключения к базе данных.
+
+        Проверка выполняется в :class:`DBStatusWorker`, поэтому медленная
+        сеть не блокирует интерфейс. Индикатор обновляется в
+        ``_on_db_status`` по сигналу ``result``. Если проверка уже идёт,
+        повторный запуск не выполняется.
+
+        Parameters
+        ----------
+        force : bool
+            Проверить соединение, даже если результат предыдущей проверки
+            моложе ``DB_STATUS_TTL_S`` секунд.
         """
+        cached = self._db_status_cache
+        if not force and cached is not None and time.monotonic() - cached[0] < DB_STATUS_TTL_S:
+            self._on_db_status(cached[1])
+            return
+
+        worker = self._db_status_worker
+        if worker is not None and worker.isRunning():
+            return
         try:
-            logger.debug("Initializing DatabaseService for status check")
-            service = DatabaseService(self.db_config)
-            service.check_connection()
-            self.db_status_label.setText("🟢 Подключено к БД")
-            self.db_status_label.setStyleSheet("color: green;")
-            return True
+            if self._db_service is None:
+                logger.debug("Initializing DatabaseService for status check")
+                self._db_service = DatabaseService(
+                    {"connection_timeout": DB_PROBE_TIMEOUT_S, **self.db_config, "persistent": True}
+                )
         except DatabaseConnectionError:
             logger.error("Database connection failed")
+            self._on_db_status(False)
+            return
+
+        worker = DBStatusWorker(self._db_service, self)
+        worker.result.connect(self._on_db_probe_result)
+        # Отработавший поток удаляется, а не копится среди дочерних объектов окна
+        worker.finished.connect(self._on_db_probe_finished)
+        worker.finished.connect(worker.deleteLater)
+        self._db_status_worker = worker
+        worker.start()
+
+    def _on_db_probe_result(self, is_connected: bool) -> None:
+        """Запоминает результат фоновой проверки и обновляет индикатор."""
+        self._db_status_cache = (time.monotonic(), is_connected)
+        self._on_db_status(is_connected)
+
+    def _on_db_probe_finished(self) -> None:
+        """Забывает завершившийся поток проверки перед его удалением."""
+        if self.sender() is self._db_status_worker:
+            self._db_status_worker = None
+
+    def _on_db_status(self, is_connected: bool) -> None:
+        """Обновляет индикатор подключения по результату проверки.
+
+        Если проверку запросил пользователь через ``test_db_connection``,
+        результат дополнительно записывается в ``log_output``.
+        """
+        if is_connected:
+            self.db_status_label.setText("🟢 Подключено к БД")
+            self.db_status_label.setStyleSheet("color: green;")
+        else:
             self.db_status_label.setText("🔴 Нет подключения к БД")
             self.db_status_label.setStyleSheet("color: red;")
-            return False
-        except Exception:
-            logger.exception("Unexpected error while checking DB connection")
-            self.db_status_label.setText("🔴 Нет подключения к БД")
-            self.db_status_label.setStyleSheet("color: red;")
-            return False
+
+        if self._report_db_status:
+            self._report_db_status = False
+            if is_connected:
+                self._log("✅ Соединение с БД успешно")
+            else:
+                self._log("❌ Не удалось подключиться к БД")
+
+    def _reset_db_service(self) -> None:
+        """Закрывает соединение проверки статуса после смены настроек БД."""
+        self._db_status_cache = None
+        service = self._db_service
+        if service is None:
+            return
+        self._db_service = None
+        worker = self._db_status_worker
+        if worker is not None and worker.isRunning():
+            # Соединение ещё используется потоком проверки — закроем по его завершении
+            worker.finished.connect(service.close)
+        else:
+            service.close()
 
     def test_db_connection(self) -> None:
         """Тестирует соединение с базой данных и сообщает результат.
 
-        Метод предназначен для ручного запуска пользователем. Сначала
-        обновляется индикатор состояния, затем результат отображается в
-        текстовом логе приложения.
+        Метод предназначен для ручного запуска пользователем. Проверка
+        выполняется в фоне; по её завершении обновляется индикатор
+        состояния, а результат отображается в текстовом логе приложения.
         """
-
-        # Сначала обновляем индикатор состояния, затем логируем итог
-        is_connected = self.update_db_status()
-        if is_connected:
-            self.log_output.append("✅ Соединение с БД успешно")
-        else:
-            self.log_output.append("❌ Не удалось подключиться к БД")
+        self._report_db_status = True
+        self.update_db_status(force=True)
+
+    def closeEvent(self, event):
+        """Дожидается проверки БД и записи конфигурации перед закрытием окна."""
+        self._prewarm_cancel.set()
+        self._write_pool.waitForDone()
+        worker = self._db_status_worker
+        if worker is not None and worker.isRunning():
+            worker.wait()
+        super().closeEvent(event)
 
 
 def run_gui():
@@ -1,40 +1,119 @@
-from label_engine import generate_labels_entry
+from label_engine import (
+    generate_labels_entry,
+    DEFAULT_PAGE_WIDTH_MM,
+    DEFAULT_PAGE_HEIGHT_MM,
+)
 from database_service import DatabaseConnectionError
-import tempfile, os
-from pdf2image import convert_from_path
+import os
+import hashlib
+import math
+import io
+import json
+import mmap
+import re
+import shutil
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from pdf2image import convert_from_path, convert_from_bytes
+from PIL import Image
 import logging
 
+try:
+    import pymupdf as fitz  # растеризация в процессе, без запуска Poppler
+except ModuleNotFoundError:  # без PyMuPDF используется pdf2image
+    fitz = None  # type: ignore
+
+try:
+    from platformdirs import user_cache_dir
+except ModuleNotFoundError:  # platformdirs — необязательная зависимость
+    user_cache_dir = None
+
 # Логгер модуля для вывода ошибок при генерации превью.
 logger = logging.getLogger(__name__)
 
+
+def _user_cache_dir():
+    """Return the per-user cache directory of the application."""
+    if user_cache_dir is not None:
+        return user_cache_dir("label_maker")
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+    return os.path.join(base or os.path.expanduser("~/.cache"), "label_maker")
+
+
+# Каталог растров превью, адресуемых по содержимому входных данных. Растры
+# переживают перезапуск приложения, но не дольше ``PREVIEW_CACHE_TTL_S``.
+PREVIEW_CACHE_DIR = os.path.join(_user_cache_dir(), "previews")
+
+# Предельный объём дискового кэша превью; сверх него удаляются давно
+# использованные файлы. Время последнего использования хранится во времени
+# доступа файла, время построения растра — во времени изменения.
+PREVIEW_DISK_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Время жизни записи кэша превью с момента её построения, с. Данные товаров
+# из БД в ключ не входят, поэтому устаревшие превью строятся заново и правки
+# в магазине доходят до окна.
+PREVIEW_CACHE_TTL_S = 10 * 60
+
+# Наибольшее разрешение растра превью; фактическое входит в ключ кэша.
+PREVIEW_DPI = 150
+
+# Шаг, с которым округляется разрешение под размер окна: мелкие изменения
+# размера не порождают новых записей кэша.
+PREVIEW_DPI_STEP = 25
+
+# Сколько отображённых в память растров превью держать открытыми.
+PREVIEW_CACHE_MAX = 32
+
+# LRU ``путь к растру -> ((RGB-данные в mmap, ширина, высота), время
+# построения)``; доступ из пула потоков.
+_PREVIEW_CACHE = OrderedDict()
+_preview_cache_lock = threading.Lock()
+
+# Блокировки записей кэша по пути растра: превью с одним ключом строит только
+# одна задача, остальные дожидаются её результата.
+_entry_locks = weakref.WeakValueDictionary()
+_entry_locks_guard = threading.Lock()
+
+# PyMuPDF не поддерживает работу из нескольких потоков: все обращения к
+# ``fitz`` (открытие документа, рендер, сохранение pixmap) выполняются под
+# этой блокировкой.
+_fitz_lock = threading.Lock()
+
+# Заголовок двоичного PPM: магия, ширина, высота, максимум яркости и один
+# пробельный символ перед данными.
+_PPM_HEADER_RE = re.compile(rb"P6\s+(\d+)\s+(\d+)\s+(\d+)\s")
+
+
 def render_preview(skus, settings, db_config, single=True):
     """
-    Генерирует PNG превью: одной этикетки или страницы.
-    Возвращает путь к PNG.
-    """
-    with tempfile.TemporaryDirectory() as tmpdir:
-        pdf_path = os.path.join(tmpdir, "preview.pdf")
-        settings['output_file'] = pdf_path
+    Генерирует превью: одной этикетки или страницы.
+    Возвращает первую страницу как ``PIL.Image``.
 
-        if single:
-            skus = skus[:1]
+    PDF формируется в памяти; на диск ничего не записывается.
+    """
+    if single:
+        skus = skus[:1]
 
-        generate_labels_entry(skus, settings, db_config)
+    buf = io.BytesIO()
+    generate_preview_pdf(buf, skus, settings, db_config)
+    image = convert_pdf_to_image(buf.getvalue())
+    if image is None:
+        raise RuntimeError("PDF не содержит страниц")
+    return image
 
-        images = convert_from_path(pdf_path, dpi=150)
-        img_path = os.path.join(tmpdir, "preview.png")
-        images[0].save(img_path, "PNG")
-        return img_path  # Временный путь
 
 def generate_preview_pdf(pdf_path, skus, settings, db_config, generator_func=generate_labels_entry):
     """Generate a PDF preview for the provided SKUs.
 
     Parameters
     ----------
-    pdf_path : str
-        Destination path for the preview PDF.
-    skus : Iterable[str] | str
-        Collection of SKUs or a single SKU string.
+    pdf_path : str | io.BytesIO
+        Destination path or in-memory buffer for the preview PDF.
+    skus : Iterable[str | tuple[str, int]] | str
+        Collection of SKUs or a single SKU string. ``(sku, count)`` pairs
+        request ``count`` copies of one label while querying the SKU once.
     settings : dict
         Label generation settings. ``output_file`` will be temporarily
         overridden with ``pdf_path``.
@@ -73,7 +152,338 @@ def generate_preview_pdf(pdf_path, skus, settings, db_config, generator_func=gen
         else:
             settings.pop("output_file", None)
 
-def convert_pdf_to_image(pdf_path):
-    """Convert the first page of a PDF to a PIL image."""
-    images = convert_from_path(pdf_path, dpi=150)
+def _render_first_page(pdf, dpi=PREVIEW_DPI):
+    """Render the first page of ``pdf`` with PyMuPDF.
+
+    ``pdf`` is a file path or the PDF content as ``bytes``. Returns an RGB
+    ``fitz.Pixmap`` or ``None`` for a document without pages. The caller
+    must hold ``_fitz_lock`` until it is done with the pixmap.
+    """
+    if isinstance(pdf, (bytes, bytearray)):
+        doc = fitz.open(stream=pdf, filetype="pdf")
+    else:
+        doc = fitz.open(pdf)
+    with doc:
+        if doc.page_count == 0:
+            return None
+        # Альфа-канал превью не нужен
+        return doc.load_page(0).get_pixmap(dpi=dpi, alpha=False)
+
+
+def target_dpi(width_px, height_px, settings):
+    """Return the preview DPI at which the page fits ``width_px x height_px``.
+
+    The page size comes from ``settings`` (``page_width_mm`` and
+    ``page_height_mm``). The result is rounded up to ``PREVIEW_DPI_STEP``
+    and capped at ``PREVIEW_DPI``, so a small widget does not rasterise
+    pixels that would only be scaled away.
+    """
+    page_w_mm = settings.get("page_width_mm", DEFAULT_PAGE_WIDTH_MM)
+    page_h_mm = settings.get("page_height_mm", DEFAULT_PAGE_HEIGHT_MM)
+    dpi = 25.4 * min(width_px / page_w_mm, height_px / page_h_mm)
+    dpi = math.ceil(dpi / PREVIEW_DPI_STEP) * PREVIEW_DPI_STEP
+    return max(PREVIEW_DPI_STEP, min(PREVIEW_DPI, dpi))
+
+
+def convert_pdf_to_image(pdf_path, dpi=PREVIEW_DPI):
+    """Convert the first page of a PDF to a PIL image.
+
+    ``pdf_path`` may be a file path or the PDF content as ``bytes``.
+    PyMuPDF is used when installed, otherwise Poppler via pdf2image.
+    """
+    if fitz is not None:
+        with _fitz_lock:
+            pix = _render_first_page(pdf_path, dpi)
+            if pix is None:
+                return None
+            return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+    # Нужна только первая страница; pdftocairo рендерит быстрее pdftoppm
+    options = dict(dpi=dpi, first_page=1, last_page=1, use_pdftocairo=True)
+    if isinstance(pdf_path, (bytes, bytearray)):
+        images = convert_from_bytes(pdf_path, **options)
+    else:
+        images = convert_from_path(pdf_path, **options)
     return images[0] if images else None
+
+
+def config_fingerprint(config):
+    """Return a short stable hash of a settings or DB config dictionary.
+
+    Callers compute it once per configuration change and reuse it for
+    cache keys instead of serialising the dictionary on every preview.
+    """
+    payload = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def preview_cache_key(skus, settings_fp, db_fp, dpi=PREVIEW_DPI):
+    """Return a content hash identifying a preview for the given inputs.
+
+    Parameters
+    ----------
+    skus : Iterable[str] | str
+        SKUs rendered on the preview.
+    settings_fp : str
+        :func:`config_fingerprint` of the label generation settings.
+    db_fp : str
+        :func:`config_fingerprint` of the database connection parameters.
+    dpi : int
+        Resolution of the preview raster.
+    """
+    sku_list = [skus] if isinstance(skus, str) else list(skus)
+    payload = json.dumps([sku_list, settings_fp, db_fp, dpi])
+    return hashlib.blake2b(payload.encode("utf-8")).hexdigest()
+
+
+def preview_cache_path(key):
+    """Return the path of the raster (``<key>.ppm``) for cache ``key``.
+
+    The cache directory is created on demand.
+    """
+    os.makedirs(PREVIEW_CACHE_DIR, exist_ok=True)
+    return os.path.join(PREVIEW_CACHE_DIR, key + ".ppm")
+
+
+def _parse_ppm_header(data):
+    """Return ``(width, height, offset)`` of a binary 8-bit PPM (P6) or ``None``."""
+    match = _PPM_HEADER_RE.match(data)
+    if match is None or int(match.group(3)) != 255:
+        return None
+    return int(match.group(1)), int(match.group(2)), match.end()
+
+
+def rasterize_preview(pdf, cache_path, dpi=PREVIEW_DPI):
+    """Rasterise the first page of ``pdf`` into the raster cache entry.
+
+    ``pdf`` is the PDF content as ``bytes`` or a path to it; ``cache_path``
+    is the raster path from :func:`preview_cache_path`. With PyMuPDF the
+    page is rendered in process; otherwise pdftoppm writes a binary PPM
+    straight into the cache directory. Either way no PIL decode or PNG
+    round trip is involved, and the file is moved into place atomically.
+    """
+    base = os.path.splitext(cache_path)[0]
+    if fitz is not None:
+        tmp_path = f"{base}.{os.getpid()}.{threading.get_ident()}.ppm"
+        with _fitz_lock:
+            pix = _render_first_page(pdf, dpi)
+            if pix is None:
+                return
+            # Пиксели пишутся прямо из буфера pixmap, без копии в bytes
+            pix.save(tmp_path, output="ppm")
+        _replace_or_discard(tmp_path, cache_path)
+        return
+
+    options = dict(
+        dpi=dpi,
+        first_page=1,
+        last_page=1,
+        fmt="ppm",
+        output_folder=os.path.dirname(cache_path),
+        output_file=f"{os.path.basename(base)}.{os.getpid()}.{threading.get_ident()}",
+        single_file=True,
+        paths_only=True,
+    )
+    if isinstance(pdf, (bytes, bytearray)):
+        paths = convert_from_bytes(pdf, **options)
+    else:
+        paths = convert_from_path(pdf, **options)
+    if not paths:
+        return
+    _replace_or_discard(paths[0], cache_path)
+
+
+def _replace_or_discard(tmp_path, cache_path):
+    """Move ``tmp_path`` to ``cache_path``, removing it if the move fails."""
+    try:
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def load_preview_rgb(cache_path, max_age=PREVIEW_CACHE_TTL_S):
+    """Return ``(buffer, width, height)`` of a cached raster or ``None``.
+
+    The buffer is a read-only view of the RGB pixels inside the
+    memory-mapped ``cache_path`` file, suitable for wrapping in a ``QImage``
+    without copying. Recently used maps are kept open in a small LRU so
+    repeated hits avoid touching the filesystem. A raster rendered more than
+    ``max_age`` seconds ago (its modification time) counts as a miss;
+    ``None`` accepts any age.
+    """
+    now = time.time()
+    with _preview_cache_lock:
+        cached = _PREVIEW_CACHE.get(cache_path)
+        if cached is not None:
+            entry, built_at = cached
+            if max_age is None or now - built_at <= max_age:
+                _PREVIEW_CACHE.move_to_end(cache_path)
+                return entry
+            del _PREVIEW_CACHE[cache_path]
+
+    try:
+        with open(cache_path, "rb") as fh:
+            built_at = os.fstat(fh.fileno()).st_mtime
+            if max_age is not None and now - built_at > max_age:
+                return None
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        # Время доступа служит меткой использования при вытеснении; время
+        # изменения остаётся временем построения растра
+        os.utime(cache_path, (now, built_at))
+    except (OSError, ValueError):
+        return None
+    header = _parse_ppm_header(mapped[:64])
+    if header is None:
+        return None
+    width, height, offset = header
+    if len(mapped) - offset != width * height * 3:
+        return None
+
+    entry = (memoryview(mapped)[offset:], width, height)
+    with _preview_cache_lock:
+        _PREVIEW_CACHE[cache_path] = (entry, built_at)
+        while len(_PREVIEW_CACHE) > PREVIEW_CACHE_MAX:
+            _PREVIEW_CACHE.popitem(last=False)
+    return entry
+
+
+def get_cached_preview(skus, settings, db_config, settings_fp=None, db_fp=None,
+                       dpi=PREVIEW_DPI):
+    """Return the preview raster for ``skus`` from the cache, building it on a miss.
+
+    Lookups go through the in-memory LRU of mapped rasters, then the raster
+    cache on disk. On a miss the PDF is generated into memory and
+    rasterised straight from the buffer; only the raster is stored.
+    A raster older than ``PREVIEW_CACHE_TTL_S`` seconds is rebuilt from
+    fresh database rows. The
+    function touches no widgets and is safe to call from
+    a worker thread.
+
+    Parameters
+    ----------
+    skus : Iterable[str | tuple[str, int]] | str
+        SKUs or ``(sku, count)`` pairs, as for :func:`generate_preview_pdf`.
+    settings : dict
+        Label generation settings.
+    db_config : dict
+        Database connection parameters.
+    settings_fp, db_fp : str, optional
+        Precomputed :func:`config_fingerprint` values; computed when omitted.
+    dpi : int
+        Resolution of the preview raster.
+
+    Returns
+    -------
+    tuple[memoryview, int, int]
+        RGB888 pixels of the first page, its width and height.
+
+    Raises
+    ------
+    DatabaseConnectionError
+        При ошибке подключения к БД во время генерации.
+    RuntimeError
+        Если PDF не был сформирован или не содержит страниц.
+    """
+    if settings_fp is None:
+        settings_fp = config_fingerprint(settings)
+    if db_fp is None:
+        db_fp = config_fingerprint(db_config)
+    cache_path = preview_cache_path(preview_cache_key(skus, settings_fp, db_fp, dpi))
+
+    cached = load_preview_rgb(cache_path)
+    if cached is not None:
+        return cached
+
+    with _entry_lock(cache_path):
+        # Пока ждали блокировку, растр могла построить другая задача;
+        # заменить уже отображённый в память файл на Windows нельзя
+        cached = load_preview_rgb(cache_path)
+        if cached is not None:
+            return cached
+        cached = _build_preview(cache_path, skus, settings, db_config, dpi)
+    trim_preview_disk_cache()
+    return cached
+
+
+def _entry_lock(cache_path):
+    """Return the lock serialising builds of the cache entry ``cache_path``."""
+    with _entry_locks_guard:
+        lock = _entry_locks.get(cache_path)
+        if lock is None:
+            lock = _entry_locks[cache_path] = threading.Lock()
+        return lock
+
+
+def _build_preview(cache_path, skus, settings, db_config, dpi):
+    """Generate the preview PDF, rasterise it to ``cache_path`` and load it."""
+    # PDF формируется в памяти и растеризуется прямо из байтов; на диск
+    # попадает только готовый растр
+    buf = io.BytesIO()
+    generate_preview_pdf(buf, skus, settings, db_config, generate_labels_entry)
+    source = buf.getvalue()
+    if not source:
+        raise RuntimeError("PDF не сформирован")
+    try:
+        rasterize_preview(source, cache_path, dpi)
+    except OSError:
+        # На Windows устаревший растр нельзя заменить, пока он отображён в
+        # память (например, показан в окне); тогда он служит ещё раз
+        cached = load_preview_rgb(cache_path, max_age=None)
+        if cached is None:
+            raise
+        logger.debug("Stale preview %s is still in use", cache_path, exc_info=True)
+        return cached
+    cached = load_preview_rgb(cache_path)
+    if cached is None:
+        raise RuntimeError("PDF не содержит страниц")
+    return cached
+
+
+def trim_preview_disk_cache(max_bytes=PREVIEW_DISK_CACHE_MAX_BYTES,
+                            max_age=PREVIEW_CACHE_TTL_S):
+    """Delete expired cache files and the least recently used ones beyond ``max_bytes``.
+
+    Files rendered more than ``max_age`` seconds ago (by modification time)
+    can no longer be hit and are always removed. The rest are ordered by
+    access time, which :func:`load_preview_rgb` sets on every raster read.
+    Files that cannot be removed (for example, still mapped on Windows) are
+    skipped.
+    """
+    now = time.time()
+    entries = []
+    try:
+        for entry in os.scandir(PREVIEW_CACHE_DIR):
+            if entry.is_file():
+                st = entry.stat()
+                if now - st.st_mtime > max_age:
+                    try:
+                        os.remove(entry.path)
+                        continue
+                    except OSError:
+                        pass
+                entries.append((st.st_atime, st.st_size, entry.path))
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    if total <= max_bytes:
+        return
+    entries.sort()
+    for _, size, path in entries:
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        if total <= max_bytes:
+            break
+
+
+def clear_preview_cache():
+    """Remove all cached preview files."""
+    with _preview_cache_lock:
+        _PREVIEW_CACHE.clear()
+    shutil.rmtree(PREVIEW_CACHE_DIR, ignore_errors=True)
@@ -0,0 +1,104 @@
+"""Виджет области превью этикетки."""
+from __future__ import annotations
+
+from collections import OrderedDict
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class PreviewWidget(QtWidgets.QWidget):
+    """Область превью, вписывающая ``QImage`` в размер виджета.
+
+    Отмасштабированные со сглаживанием копии последних изображений
+    кэшируются и переиспользуются при перерисовках и при возврате к уже
+    показанному изображению (например, при переключении режима). Пока пользователь меняет размер
+    окна, изображение рисуется быстрым преобразованием; сглаженная копия
+    строится после паузы ``SMOOTH_DELAY_MS``.
+    """
+
+    BACKGROUND = QtGui.QColor("#f0f0f0")
+    BORDER = QtGui.QColor("#ccc")
+    SMOOTH_DELAY_MS = 150
+    SCALED_CACHE_MAX = 4
+
+    def __init__(self, placeholder: str = "Превью", parent=None):
+        super().__init__(parent)
+        self._placeholder = placeholder
+        self._image: QtGui.QImage | None = None
+        # Отмасштабированные изображения: (cacheKey, ширина, высота) -> QPixmap
+        self._scaled: OrderedDict[tuple[int, int, int], QtGui.QPixmap] = OrderedDict()
+        self._resizing = False
+        self._smooth_timer = QtCore.QTimer(self)
+        self._smooth_timer.setSingleShot(True)
+        self._smooth_timer.setInterval(self.SMOOTH_DELAY_MS)
+        self._smooth_timer.timeout.connect(self._on_resize_finished)
+        self.setSizePolicy(
+            QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding
+        )
+
+    def image(self) -> QtGui.QImage | None:
+        """Возвращает отображаемое изображение."""
+        return self._image
+
+    def set_image(self, image: QtGui.QImage | None) -> None:
+        """Задаёт изображение превью и запрашивает перерисовку."""
+        self._image = image
+        self.update()
+
+    def _target_rect(self) -> QtCore.QRect:
+        """Прямоугольник, в который вписывается изображение по центру."""
+        size = self._image.size().scaled(self.size(), QtCore.Qt.KeepAspectRatio)
+        rect = QtCore.QRect(QtCore.QPoint(0, 0), size)
+        rect.moveCenter(self.rect().center())
+        return rect
+
+    def _scaled_pixmap(self, size: QtCore.QSize) -> QtGui.QPixmap:
+        """Возвращает изображение размера ``size``, при необходимости строя его."""
+        key = (self._image.cacheKey(), size.width(), size.height())
+        pixmap = self._scaled.get(key)
+        if pixmap is not None:
+            self._scaled.move_to_end(key)
+            return pixmap
+
+        # Масштабирование выполняется один раз на размер, поэтому сглаживание
+        # используется всегда: при увеличении растра, ограниченного
+        # PREVIEW_DPI, быстрое преобразование даёт ступенчатый текст
+        pixmap = QtGui.QPixmap.fromImage(
+            self._image.scaled(
+                size, QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation
+            )
+        )
+        self._scaled[key] = pixmap
+        while len(self._scaled) > self.SCALED_CACHE_MAX:
+            self._scaled.popitem(last=False)
+        return pixmap
+
+    def _on_resize_finished(self) -> None:
+        """Перерисовывает превью сглаженным после окончания изменения размера."""
+        self._resizing = False
+        self.update()
+
+    def resizeEvent(self, event):
+        """Переключает отрисовку в быстрый режим на время изменения размера."""
+        self._resizing = True
+        self._scaled.clear()
+        self._smooth_timer.start()
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        """Рисует фон, изображение (или подпись-заглушку) и рамку."""
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), self.BACKGROUND)
+
+        if self._image is None or self._image.isNull():
+            painter.drawText(self.rect(), QtCore.Qt.AlignCenter, self._placeholder)
+        else:
+            target = self._target_rect()
+            if self._resizing:
+                painter.drawImage(target, self._image)
+            else:
+                painter.drawPixmap(target.topLeft(), self._scaled_pixmap(target.size()))
+
+        painter.setPen(self.BORDER)
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
+        painter.end()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import config_loader
+from config_loader import load_settings, save_json
+
+
+class SaveJsonTests(unittest.TestCase):
+    """Проверка атомарной записи конфигурации и её повторного чтения."""
+
+    DATA = {"importer": "ООО «Ромашка»", "font_size": 6, "flags": [True, None]}
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.path = os.path.join(self.dir, "settings.json")
+
+    def _round_trip(self):
+        save_json(self.path, self.DATA)
+        self.assertEqual(load_settings(self.path), self.DATA)
+        with open(self.path, encoding="utf-8") as fh:
+            self.assertIn("Ромашка", fh.read())
+        self.assertEqual(os.listdir(self.dir), ["settings.json"])
+
+    @unittest.skipIf(config_loader.orjson is None, "orjson не установлен")
+    def test_round_trip_with_orjson(self):
+        self._round_trip()
+
+    def test_round_trip_without_orjson(self):
+        with patch.object(config_loader, "orjson", None):
+            self._round_trip()
+
+    def test_failed_replace_removes_side_file(self):
+        with patch.object(config_loader.os, "replace", side_effect=OSError("locked")):
+            with self.assertRaises(OSError):
+                save_json(self.path, self.DATA)
+        self.assertEqual(os.listdir(self.dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
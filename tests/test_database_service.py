@@ -2,6 +2,7 @@ import unittest
 from unittest.mock import MagicMock, patch
 import mysql.connector
 
+import database_service
 from database_service import DatabaseService, DatabaseConnectionError
 
 
@@ -48,6 +49,76 @@ class DatabaseServiceContextManagerTests(unittest.TestCase):
                 self.service.check_connection()
 
 
+class DatabaseServicePreparedQueryTests(unittest.TestCase):
+    """Тесты выборки товаров подготовленными запросами."""
+
+    def test_get_products_by_skus_uses_prepared_batches(self):
+        service = DatabaseService({'host': 'localhost'})
+        cursor = MagicMock()
+        cursor.fetchmany.return_value = []
+        cursor.fetchall.return_value = []
+        cursor_manager = MagicMock()
+        cursor_manager.__enter__.return_value = cursor
+        conn = MagicMock()
+        conn.cursor.return_value = cursor_manager
+        skus = [f"SKU{i}" for i in range(database_service.SKU_BATCH_SIZE + 1)]
+        with patch('mysql.connector.connect', return_value=conn):
+            result = service.get_products_by_skus(skus)
+        self.assertEqual(result, {})
+        conn.cursor.assert_called_once_with(prepared=True, dictionary=True)
+        self.assertEqual(cursor.execute.call_count, 2)
+        self.assertEqual(len(cursor.execute.call_args_list[1].args[1]), 1)
+
+
+class DatabaseServicePoolTests(unittest.TestCase):
+    """Тесты работы через пул соединений."""
+
+    def setUp(self):
+        # Общие сервисы — состояние модуля; тесты не оставляют их после себя
+        patcher = patch.dict(database_service._shared_services, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_shared_service_is_reused_and_pooled(self):
+        config = {'host': 'pool-test', 'persistent': True}
+        service = database_service.get_shared_service(config)
+        self.assertIs(service, database_service.get_shared_service(dict(config)))
+        self.assertEqual(service._pool_size, database_service.DEFAULT_POOL_SIZE)
+        self.assertFalse(service._persistent)
+
+    def test_close_shared_services_closes_pools(self):
+        with patch('mysql.connector.pooling.MySQLConnectionPool') as mock_pool:
+            service = database_service.get_shared_service({'host': 'pool-test'})
+            service._acquire_connection()
+            database_service.close_shared_services()
+        mock_pool.return_value._remove_connections.assert_called_once()
+        self.assertIsNot(service, database_service.get_shared_service({'host': 'pool-test'}))
+
+    def test_connection_returned_to_closed_pool_is_closed(self):
+        with patch('mysql.connector.pooling.MySQLConnectionPool') as mock_pool:
+            pool = mock_pool.return_value
+            pool.get_connection.return_value._cnx_pool = pool
+            service = DatabaseService({'host': 'localhost', 'pool_size': 2})
+            with service._connect():
+                service.close()
+                self.assertEqual(pool._remove_connections.call_count, 1)
+        self.assertEqual(pool._remove_connections.call_count, 2)
+
+    def test_pool_is_created_lazily_and_falls_back_when_exhausted(self):
+        with patch('mysql.connector.pooling.MySQLConnectionPool') as mock_pool:
+            service = DatabaseService({'host': 'localhost', 'pool_size': 2})
+            mock_pool.assert_not_called()
+            mock_pool.return_value.get_connection.side_effect = (
+                mysql.connector.errors.PoolError('exhausted')
+            )
+            conn = MagicMock()
+            with patch('mysql.connector.connect', return_value=conn):
+                with service._connect() as acquired:
+                    self.assertIs(acquired, conn)
+        mock_pool.assert_called_once_with(pool_size=2, pool_reset_session=True, host='localhost')
+        conn.close.assert_called_once()
+
+
 class DatabaseServiceRetryTests(unittest.TestCase):
     """Тесты повторного подключения при временных ошибках."""
 
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from reportlab.lib.utils import simpleSplit
+
+from label_engine import LabelGenerator, _fast_split, load_skus_from_file, split_sku_copies
+
+
+class SplitSkuCopiesTests(unittest.TestCase):
+    """Проверка разбора списка SKU с числом копий."""
+
+    def test_plain_skus_are_deduplicated_in_order(self):
+        skus, copies = split_sku_copies(["B", "A", "B"])
+        self.assertEqual(skus, ["B", "A"])
+        self.assertEqual(copies, {})
+
+    def test_pairs_set_copies(self):
+        skus, copies = split_sku_copies([("A", 3), "B", ("A", 2)])
+        self.assertEqual(skus, ["A", "B"])
+        self.assertEqual(copies, {"A": 5})
+
+
+class FastSplitTests(unittest.TestCase):
+    """Проверка совпадения быстрого разбиения строк с ``simpleSplit``."""
+
+    def test_matches_simple_split(self):
+        for text in ["Цена", "  двойные   пробелы ", "", "   ", "строка\nвторая", "слово " * 40]:
+            with self.subTest(text=text):
+                self.assertEqual(
+                    _fast_split(text, "Helvetica", 6, 100),
+                    tuple(simpleSplit(text, "Helvetica", 6, 100)),
+                )
+
+
+class GenerateLabelsEntryTests(unittest.TestCase):
+    """Проверка тиражирования этикеток по паре ``(sku, count)``."""
+
+    def test_pair_queries_once_and_repeats_product(self):
+        product = {"meta": {"_sku": "A", "_stock": "100"}}
+        db_service = MagicMock()
+        db_service.get_products_by_skus.return_value = {1: product}
+        generator = LabelGenerator({}, db_service)
+        with patch.object(generator, "generate_labels") as mock_generate:
+            generator.generate_labels_entry([("A", 3)])
+        db_service.get_products_by_skus.assert_called_once_with(["A"])
+        labels = mock_generate.call_args.args[0]
+        self.assertEqual(len(labels), 3)
+        self.assertTrue(all(p is product for p in labels.values()))
+
+    def test_pair_matches_product_sku_case_insensitively(self):
+        product = {"meta": {"_sku": "abc", "_stock": "100"}}
+        db_service = MagicMock()
+        db_service.get_products_by_skus.return_value = {1: product}
+        generator = LabelGenerator({}, db_service)
+        with patch.object(generator, "generate_labels") as mock_generate:
+            generator.generate_labels_entry([("ABC ", 2)])
+        self.assertEqual(len(mock_generate.call_args.args[0]), 2)
+
+
+class LoadSkusFromFileTests(unittest.TestCase):
+    """Проверка чтения списка SKU из текстового файла."""
+
+    def test_lines_are_stripped_and_empty_lines_skipped(self):
+        fd, path = tempfile.mkstemp(suffix=".txt")
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(" A-1 \r\n\r\nБ-2\n\t\nC-3".encode("utf-8"))
+        self.assertEqual(load_skus_from_file(path), ["A-1", "Б-2", "C-3"])
+
+    def test_empty_file(self):
+        fd, path = tempfile.mkstemp(suffix=".txt")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        self.assertEqual(load_skus_from_file(path), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
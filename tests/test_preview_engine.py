@@ -1,11 +1,15 @@
+import inspect
 import os
+import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import patch
 
 # Ensure Qt works in headless mode
 os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
 
-from PyQt5 import QtWidgets
+from PyQt5 import QtCore, QtWidgets, QtTest
 
 import preview_engine
 from preview_engine import generate_preview_pdf
@@ -32,6 +36,162 @@ class GeneratePreviewPdfTests(unittest.TestCase):
         self.assertTrue(any("DB ERROR" in msg for msg in cm.output))
 
 
+class GeneratePreviewPdfSignatureTests(unittest.TestCase):
+    """Guard the public signature of ``generate_preview_pdf``."""
+
+    def test_signature(self):
+        self.assertEqual(
+            tuple(inspect.signature(generate_preview_pdf).parameters),
+            ("pdf_path", "skus", "settings", "db_config", "generator_func"),
+        )
+
+
+class PreviewCacheKeyTests(unittest.TestCase):
+    """Check that preview cache keys follow the rendered inputs."""
+
+    def test_key_is_stable_and_settings_sensitive(self):
+        fp = preview_engine.config_fingerprint
+        db_fp = fp({})
+        key = preview_engine.preview_cache_key("A", fp({"font_size": 6}), db_fp)
+        self.assertEqual(key, preview_engine.preview_cache_key(["A"], fp({"font_size": 6}), db_fp))
+        self.assertNotEqual(key, preview_engine.preview_cache_key("A", fp({"font_size": 7}), db_fp))
+        self.assertNotEqual(key, preview_engine.preview_cache_key(["A", "A"], fp({"font_size": 6}), db_fp))
+
+    def test_key_depends_on_dpi(self):
+        fp = preview_engine.config_fingerprint({})
+        self.assertNotEqual(
+            preview_engine.preview_cache_key("A", fp, fp, dpi=150),
+            preview_engine.preview_cache_key("A", fp, fp, dpi=300),
+        )
+
+    def test_target_dpi_fits_page_and_is_capped(self):
+        settings = {"page_width_mm": 254, "page_height_mm": 254}
+        self.assertEqual(preview_engine.target_dpi(500, 1000, settings), 50)
+        self.assertEqual(preview_engine.target_dpi(510, 1000, settings), 75)
+        self.assertEqual(preview_engine.target_dpi(10000, 10000, settings), preview_engine.PREVIEW_DPI)
+
+    def test_fingerprint_ignores_key_order(self):
+        self.assertEqual(
+            preview_engine.config_fingerprint({"a": 1, "b": 2}),
+            preview_engine.config_fingerprint({"b": 2, "a": 1}),
+        )
+
+
+def isolate_preview_cache(test):
+    """Point the preview disk cache of ``test`` at a temporary directory."""
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    patcher = patch.object(preview_engine, "PREVIEW_CACHE_DIR", tmp.name)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+    return tmp.name
+
+
+class GetCachedPreviewTests(unittest.TestCase):
+    """Check that cached previews are returned without regenerating the PDF."""
+
+    def setUp(self):
+        self.cache_dir = isolate_preview_cache(self)
+
+    def test_concurrent_requests_build_entry_once(self):
+        calls = []
+
+        def build(cache_path, *args):
+            calls.append(cache_path)
+            time.sleep(0.05)
+            with open(cache_path, "wb") as fh:
+                fh.write(b"P6 1 1 255\n\x00\x00\x00")
+            return preview_engine.load_preview_rgb(cache_path)
+
+        with patch.object(preview_engine, "_build_preview", side_effect=build):
+            threads = [
+                threading.Thread(target=preview_engine.get_cached_preview, args=("A", {}, {}))
+                for _ in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+
+    def test_expired_raster_is_a_miss(self):
+        path = os.path.join(self.cache_dir, "old.ppm")
+        with open(path, "wb") as fh:
+            fh.write(b"P6 1 1 255\n\x00\x00\x00")
+        built_at = time.time() - preview_engine.PREVIEW_CACHE_TTL_S - 1
+        os.utime(path, (built_at, built_at))
+        self.assertIsNone(preview_engine.load_preview_rgb(path))
+        self.assertIsNotNone(preview_engine.load_preview_rgb(path, max_age=None))
+        # Чтение отмечает использование, но не обновляет время построения
+        self.assertEqual(os.stat(path).st_mtime, built_at)
+        self.assertIsNone(preview_engine.load_preview_rgb(path))
+
+    def test_cache_hit_skips_generation(self):
+        entry = (memoryview(b"\x00" * 3), 1, 1)
+        with patch.object(preview_engine, "load_preview_rgb", return_value=entry), patch.object(
+            preview_engine, "generate_preview_pdf"
+        ) as mock_generate:
+            self.assertIs(preview_engine.get_cached_preview("A", {}, {}), entry)
+        mock_generate.assert_not_called()
+
+
+class TrimPreviewDiskCacheTests(unittest.TestCase):
+    """Check that the disk cache drops the least recently used files first."""
+
+    def test_oldest_files_removed_until_under_limit(self):
+        cache_dir = isolate_preview_cache(self)
+        now = time.time()
+        for i in range(3):
+            path = os.path.join(cache_dir, f"{i}.ppm")
+            with open(path, "wb") as fh:
+                fh.write(b"x" * 10)
+            os.utime(path, (now - 10 + i, now))
+        preview_engine.trim_preview_disk_cache(15)
+        self.assertEqual(os.listdir(cache_dir), ["2.ppm"])
+
+    def test_expired_files_removed_under_limit(self):
+        cache_dir = isolate_preview_cache(self)
+        now = time.time()
+        for name, built_at in (("old.ppm", now - preview_engine.PREVIEW_CACHE_TTL_S - 1), ("new.ppm", now)):
+            path = os.path.join(cache_dir, name)
+            with open(path, "wb") as fh:
+                fh.write(b"x")
+            os.utime(path, (now, built_at))
+        preview_engine.trim_preview_disk_cache()
+        self.assertEqual(os.listdir(cache_dir), ["new.ppm"])
+
+
+class FitzLockTests(unittest.TestCase):
+    """Check that PyMuPDF is only called under ``_fitz_lock``."""
+
+    def test_render_holds_lock(self):
+        held = []
+
+        def render(pdf, dpi):
+            held.append(preview_engine._fitz_lock.locked())
+            return None
+
+        with patch.object(preview_engine, "fitz", object()), patch.object(
+            preview_engine, "_render_first_page", side_effect=render
+        ):
+            self.assertIsNone(preview_engine.convert_pdf_to_image(b"%PDF"))
+            preview_engine.rasterize_preview(b"%PDF", os.path.join(tempfile.gettempdir(), "x.ppm"))
+        self.assertEqual(held, [True, True])
+        self.assertFalse(preview_engine._fitz_lock.locked())
+
+
+class RenderPreviewImageTests(unittest.TestCase):
+    """Check that the preview QImage wraps the cached pixels without a copy."""
+
+    def test_image_shares_cached_buffer(self):
+        pixels = bytearray(b"\x00\x00\x00" * 2)
+        with patch.object(main, "get_cached_preview", return_value=(memoryview(pixels), 2, 1)):
+            image, buffer = main.render_preview_image("A", {}, {}, "s", "d")
+        self.assertEqual((image.width(), image.height()), (2, 1))
+        pixels[3:6] = b"\xff\x00\x00"
+        self.assertEqual(image.pixelColor(1, 0).red(), 255)
+
+
 class PreviewErrorHandlingTests(unittest.TestCase):
     """Check that GUI handlers show a message box on DB errors."""
 
@@ -39,6 +199,9 @@ class PreviewErrorHandlingTests(unittest.TestCase):
     def setUpClass(cls):
         cls.app = QtWidgets.QApplication([])
 
+    def setUp(self):
+        isolate_preview_cache(self)
+
     def _create_window(self):
         with patch.object(main, "load_settings", return_value={}), patch.object(
             main, "load_db_config", return_value={}), patch.object(
@@ -46,20 +209,28 @@ class PreviewErrorHandlingTests(unittest.TestCase):
         ):
             return main.LabelMakerApp()
 
+    def _wait_for_preview(self):
+        """Дождаться запуска и завершения фоновой задачи превью."""
+        QtTest.QTest.qWait(main.PREVIEW_DEBOUNCE_MS * 2)
+        QtCore.QThreadPool.globalInstance().waitForDone()
+        QtWidgets.QApplication.processEvents()
+
     def test_show_label_preview_displays_message_box(self):
         window = self._create_window()
         with patch.object(
-            main, "generate_preview_pdf", side_effect=DatabaseConnectionError("fail")
+            preview_engine, "generate_preview_pdf", side_effect=DatabaseConnectionError("fail")
         ), patch.object(QtWidgets.QMessageBox, "critical") as mock_critical:
             window.show_label_preview("A")
+            self._wait_for_preview()
             mock_critical.assert_called_once()
 
     def test_show_page_preview_displays_message_box(self):
         window = self._create_window()
         with patch.object(
-            main, "generate_preview_pdf", side_effect=DatabaseConnectionError("fail")
+            preview_engine, "generate_preview_pdf", side_effect=DatabaseConnectionError("fail")
         ), patch.object(QtWidgets.QMessageBox, "critical") as mock_critical:
             window.show_page_preview("A")
+            self._wait_for_preview()
             mock_critical.assert_called_once()
 
 